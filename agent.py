@@ -1,11 +1,14 @@
 from datetime import datetime, timezone
+from functools import partial
 from uuid import uuid4
 from typing import Any, Dict
+import asyncio
 import json
+import logging
 import os
+import time
 from dotenv import load_dotenv
 from uagents import Context, Model, Protocol, Agent
-from hyperon import MeTTa
 
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
@@ -16,13 +19,16 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 
-from metta.incidentrag import IncidentRAG
-from metta.knowledge import initialize_knowledge_graph
-from metta.utils import LLM, process_query
+# Only stdlib-light modules here; MeTTa, openai and the rest load in build_runtime
+from metta.admission import AdmissionController, RateLimiter, priority_of
+from metta.metrics import metrics, start_metrics_server
 
 
 load_dotenv()
 
+# MeTTa lookups log at DEBUG; keep the package quiet unless asked
+logging.getLogger("metta").setLevel(os.getenv("METTA_LOG_LEVEL", "WARNING"))
+
 
 agent = Agent(
     name="Incident Response MeTTa Agent",
@@ -45,10 +51,199 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
     )
 
 
-metta = MeTTa()
-initialize_knowledge_graph(metta)
-rag = IncidentRAG(metta)
-llm = LLM(api_key=os.getenv("ASI_ONE_API_KEY"))
+def create_end_session_chat() -> ChatMessage:
+    """Create a chat message that only closes the session."""
+    return ChatMessage(
+        timestamp=datetime.now(timezone.utc),
+        msg_id=uuid4(),
+        content=[EndSessionContent(type="end-session")],
+    )
+
+
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") == "1"
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+STARTUP_WAIT = float(os.getenv("STARTUP_WAIT", "10"))
+PROMPT_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "300"))
+
+# Built by build_runtime after the agent has started
+store = rag = classifier = correlator = llm = None
+pool = None
+pool_ready = []
+runtime_ready = asyncio.Event()
+# Set once warm_up has finished, successfully or not; startup_error holds the failure
+startup_done = asyncio.Event()
+startup_error = None
+startup_report = {}
+
+
+def start_workers():
+    """Fork the graph worker processes; call from the real main process only, before other threads start.
+
+    Replacement workers are started via forkserver, which re-runs this file
+    as ``__mp_main__``; the pool must not be built again there.
+    """
+    global pool, pool_ready
+    from metta.workers import WorkerPool
+
+    # Graph work runs in worker processes; this process only does I/O.
+    # Workers load their graphs in parallel while the agent starts.
+    pool = WorkerPool(WORKERS, {
+        "store_path": os.getenv("KNOWLEDGE_STORE", "learned_knowledge.db"),
+        "attack_bundle": os.getenv("ATTACK_BUNDLE"),
+        "snapshot_dir": os.getenv("ATTACK_SNAPSHOT_DIR", ".cache"),
+        "use_index": os.getenv("RAG_INDEX", "1") == "1",
+        "materialize": os.getenv("RAG_MATERIALIZE", "1") == "1",
+        "classifier_threshold": float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75")),
+        "correlation_window": float(os.getenv("CORRELATION_WINDOW", "1800")),
+    })
+    pool_ready = pool.start()
+
+
+def _timed(stage, start):
+    startup_report[stage] = round(time.perf_counter() - start, 3)
+    return time.perf_counter()
+
+
+def build_runtime():
+    """Load the knowledge graph, stores, classifier and LLM client (blocking; run off the event loop)."""
+    global store, rag, classifier, correlator, llm
+    from metta.cache import CompletionCache
+    from metta.utils import AsyncLLM
+
+    t = time.perf_counter()
+    if pool is None:
+        from hyperon import MeTTa
+        from metta.attack import load_attack_bundle
+        from metta.classifier import LocalClassifier
+        from metta.correlation import CorrelationEngine
+        from metta.incidentrag import IncidentRAG
+        from metta.knowledge import initialize_knowledge_graph
+        from metta.store import KnowledgeStore
+        t = _timed("imports", t)
+
+        metta = MeTTa()
+        initialize_knowledge_graph(metta)
+        if os.getenv("ATTACK_BUNDLE"):
+            load_attack_bundle(metta, os.getenv("ATTACK_BUNDLE"), os.getenv("ATTACK_SNAPSHOT_DIR", ".cache"))
+        t = _timed("graph", t)
+        store = KnowledgeStore(os.getenv("KNOWLEDGE_STORE", "learned_knowledge.db"))
+        store.replay(metta)
+        t = _timed("store", t)
+        rag = IncidentRAG(
+            metta,
+            use_index=os.getenv("RAG_INDEX", "1") == "1",
+            check_index=os.getenv("RAG_INDEX_CHECK") == "1",
+            store=store,
+            materialize=os.getenv("RAG_MATERIALIZE", "1") == "1",
+        )
+        classifier = LocalClassifier(rag, threshold=float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75")))
+        correlator = CorrelationEngine(window=float(os.getenv("CORRELATION_WINDOW", "1800")))
+        t = _timed("index", t)
+
+    llm = AsyncLLM(
+        api_key=os.getenv("ASI_ONE_API_KEY"),
+        cache=CompletionCache(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+            similarity=float(os.getenv("LLM_CACHE_SIMILARITY")) if os.getenv("LLM_CACHE_SIMILARITY") else None,
+            path=os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+        ),
+        max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+        timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    )
+    _timed("llm", t)
+
+
+async def warm_up(ctx: Context):
+    """Build the runtime in a thread, wait for any worker processes, then open the readiness gate.
+
+    Nothing awaits this task, so a failure is recorded in ``startup_error``
+    for the message handler to report instead of being raised.
+    """
+    global startup_error
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(build_runtime)
+        if pool_ready:
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in pool_ready))
+            startup_report["workers"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        startup_error = e
+        ctx.logger.exception(f"❌ Startup failed: {e}")
+        return
+    finally:
+        startup_done.set()
+    startup_report["total"] = round(time.perf_counter() - start, 3)
+    runtime_ready.set()
+    ctx.logger.info(f"🚀 Ready in {startup_report['total']}s: {startup_report}")
+
+admission = AdmissionController(
+    concurrency=int(os.getenv("ADMISSION_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "200")),
+    degrade_depth=int(os.getenv("ADMISSION_DEGRADE_DEPTH", "50")),
+    rate_limiter=RateLimiter(
+        rate=float(os.getenv("SENDER_RATE", "1")),
+        burst=int(os.getenv("SENDER_BURST", "5")),
+    ),
+)
+
+
+async def answer_query(ctx: Context, sender: str, user_query: str, session: str):
+    """Run the full pipeline for one admitted query and send the answer."""
+    try:
+        await _answer_query(ctx, sender, user_query, session)
+    except Exception as e:
+        ctx.logger.error(f"❌ Error processing incident query: {e}")
+        # A stream may already be under way; close its session with the error
+        await ctx.send(
+            sender,
+            create_text_chat(
+                "⚠️ I encountered an error analyzing this incident. Please try again.",
+                end_session=STREAM_RESPONSES,
+            ),
+        )
+
+
+async def _answer_query(ctx: Context, sender: str, user_query: str, session: str):
+    from metta.utils import aprocess_query, astream_query
+
+    if STREAM_RESPONSES:
+        # Graph findings first, then the LLM narrative as it streams
+        if pool is not None:
+            events = pool.astream_query(user_query, llm, session=session, budget=PROMPT_BUDGET, sender=sender)
+        else:
+            events = astream_query(
+                user_query, rag, llm, classifier,
+                correlator=correlator, session=session, budget=PROMPT_BUDGET, sender=sender,
+            )
+        async for _, text in events:
+            with metrics.span("send"):
+                await ctx.send(sender, create_text_chat(text))
+        with metrics.span("send"):
+            await ctx.send(sender, create_end_session_chat())
+        return
+
+    # Process query with MeTTa RAG and ASI LLM
+    if pool is not None:
+        response = await pool.aprocess_query(user_query, llm, session=session, budget=PROMPT_BUDGET, sender=sender)
+    else:
+        response = await aprocess_query(
+            user_query, rag, llm, classifier,
+            correlator=correlator, session=session, budget=PROMPT_BUDGET, sender=sender,
+        )
+
+    if isinstance(response, dict):
+        answer_text = (
+            f"**{response.get('selected_question', user_query)}**\n\n"
+            f"{response.get('humanized_answer', 'I could not process your query.')}"
+        )
+    else:
+        answer_text = str(response)
+
+    with metrics.span("send"):
+        await ctx.send(sender, create_text_chat(answer_text))
 
 
 chat_proto = Protocol(spec=chat_protocol_spec)
@@ -76,19 +271,68 @@ async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
             user_query = item.text.strip()
             ctx.logger.info(f"🔍 Received cybersecurity query from {sender}: {user_query}")
 
+            session = str(ctx.session)
+            if not runtime_ready.is_set():
+                try:
+                    await asyncio.wait_for(startup_done.wait(), STARTUP_WAIT)
+                except asyncio.TimeoutError:
+                    await ctx.send(
+                        sender,
+                        create_text_chat(
+                            "🔄 The agent is still warming up. Please retry in a few seconds.", end_session=True
+                        ),
+                    )
+                    continue
+                if startup_error is not None:
+                    await ctx.send(
+                        sender,
+                        create_text_chat(
+                            "⚠️ The agent failed to start and cannot analyze incidents. "
+                            "Please contact its operator.",
+                            end_session=True,
+                        ),
+                    )
+                    continue
+
+            retry_after = admission.throttle(sender)
+            if retry_after:
+                await ctx.send(
+                    sender,
+                    create_text_chat(
+                        f"⏳ Too many requests. Please retry in {retry_after:.0f}s.", end_session=True
+                    ),
+                )
+                continue
+
             try:
-                # Process query with MeTTa RAG and ASI LLM
-                response = process_query(user_query, rag, llm)
+                from metta.utils import format_findings, local_findings
 
-                if isinstance(response, dict):
-                    answer_text = (
-                        f"**{response.get('selected_question', user_query)}**\n\n"
-                        f"{response.get('humanized_answer', 'I could not process your query.')}"
+                # Cheap graph-only pre-score decides queue priority and is the degraded answer
+                if pool is not None:
+                    local = await pool.local_findings(user_query, session=session)
+                else:
+                    local = local_findings(user_query, rag, classifier)
+                priority = priority_of(local)
+                decision, retry_after = admission.admit(priority)
+                if decision == "rejected":
+                    await ctx.send(
+                        sender,
+                        create_text_chat(
+                            f"⏳ The agent is at capacity. Please retry in {retry_after:.0f}s.", end_session=True
+                        ),
+                    )
+                elif decision == "degraded":
+                    summary = format_findings(local) or "No knowledge-graph match for this report."
+                    await ctx.send(
+                        sender,
+                        create_text_chat(
+                            f"{summary}\n\n_High load: knowledge-graph answer only, without the LLM narrative._",
+                            end_session=True,
+                        ),
                     )
                 else:
-                    answer_text = str(response)
-
-                await ctx.send(sender, create_text_chat(answer_text))
+                    # Queued, not awaited: the answer is sent when a slot frees up
+                    admission.submit(priority, partial(answer_query, ctx, sender, user_query, session))
 
             except Exception as e:
                 ctx.logger.error(f"❌ Error processing incident query: {e}")
@@ -117,13 +361,35 @@ async def startup(ctx: Context):
     ctx.logger.info(f"📬 Agent Address: {agent.address}")
     ctx.logger.info(f"🌐 Mailbox: ENABLED")
     ctx.logger.info("")
-    ctx.logger.info("Ready to analyze and respond to cybersecurity incidents!")
+    # Load the graph in the background so the agent registers without waiting for it
+    asyncio.ensure_future(warm_up(ctx))
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(int(os.getenv("METRICS_PORT")))
+        ctx.logger.info(f"📈 Metrics: http://127.0.0.1:{os.getenv('METRICS_PORT')}/metrics")
+    ctx.logger.info("Warming up; ready to analyze cybersecurity incidents shortly!")
     ctx.logger.info("=" * 60)
 
+@agent.on_interval(period=float(os.getenv("METRICS_LOG_INTERVAL", "300")))
+async def log_metrics(ctx: Context):
+    """Periodic per-stage latency summary."""
+    for stage, stats in metrics.summary().items():
+        ctx.logger.info(f"⏱️ {stage}: {stats}")
+    ctx.logger.info(f"🚦 Admission: depth={admission.depth} {admission.stats}")
+
+
 @agent.on_event("shutdown")
 async def shutdown(ctx: Context):
     """Agent shutdown handler."""
     ctx.logger.info("🛡️ Shutting down Cybersecurity MeTTa Agent...")
+    admission.close()
+    if pool is not None:
+        pool.close()
+    if store is not None:
+        store.close()
+    if llm is not None:
+        ctx.logger.info(f"LLM cache stats: {llm.cache.stats()}")
+        llm.cache.close()
+        await llm.close()
 
 
 agent.include(chat_proto, publish_manifest=True)
@@ -145,4 +411,6 @@ if __name__ == "__main__":
     print("  • Real-time Chat Protocol for Human-Agent Interaction")
     print("="*60 + "\n")
 
+    if WORKERS > 1:
+        start_workers()
     agent.run()
\ No newline at end of file
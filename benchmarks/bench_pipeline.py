@@ -0,0 +1,380 @@
+"""Offline benchmark for the incident query pipeline.
+
+Drives ``process_query``, ``aprocess_query`` and (when uAgents is installed)
+``agent.handle_message`` against a deterministic fake LLM, over knowledge
+graphs scaled from the built-in ~50 atoms up to tens of thousands, and writes
+the results as JSON so runs can be compared between versions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --sizes 0 1000 10000 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from hyperon import MeTTa, E, S, ValueAtom
+
+from metta.classifier import LocalClassifier
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+from metta.metrics import metrics
+from metta.utils import aprocess_query, process_query
+
+TACTICS = ["TA0002", "TA0003", "TA0005", "TA0006", "TA0008", "TA0040"]
+SEVERITIES = ["critical", "high", "medium", "low"]
+KNOWN_INDICATORS = ["powershell", "smb_traffic", "scheduled_task", "rdp_connection", "lsass_access", "file_encryption"]
+FAQS = ["What should I do first?", "Should I reset passwords?", "Is this ransomware?"]
+
+
+class FakeLLM:
+    """Deterministic stand-in for ``LLM`` with a fixed artificial latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def respond(self, prompt):
+        self.calls += 1
+        if "Classify the intent" in prompt:
+            query = prompt.split("'")[1] if "'" in prompt else prompt
+            if query in FAQS:
+                return json.dumps({"intent": "faq", "indicators": []})
+            indicators = re.findall(r"\b[a-z0-9]+(?:_[a-z0-9]+)+\b|\bpowershell\b", query)
+            return json.dumps({"intent": "indicator" if indicators else "response", "indicators": indicators})
+        if "Suggest MITRE ATT&CK techniques" in prompt:
+            return "T1071.004"
+        if "comma-separated list" in prompt:
+            return "Isolate host, collect memory, reset credentials"
+        if "new cybersecurity FAQ" in prompt:
+            return "Contain first, then investigate."
+        if "Reply with JSON" in prompt:
+            return json.dumps({"question": "synthetic alert", "answer": "Contain the affected hosts and review logs."})
+        return "Contain the affected hosts and review logs."
+
+    def create_completion(self, prompt, max_tokens=300, similar=False):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(prompt)
+
+
+class FakeAsyncLLM(FakeLLM):
+    """Async variant of ``FakeLLM`` matching the ``AsyncLLM`` interface."""
+
+    async def create_completion(self, prompt, max_tokens=300, key=None, similar=False):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def stream_completion(self, prompt, max_tokens=300, similar=False):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for word in self.respond(prompt).split(" "):
+            yield word + " "
+
+
+def build_graph(extra_indicators, seed=0):
+    """Return a MeTTa space with the built-in graph plus ``extra_indicators`` synthetic chains."""
+    rng = random.Random(seed)
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    space = metta.space()
+    for i in range(extra_indicators):
+        technique = f"T9{i:05d}"
+        space.add_atom(E(S("indicator"), S(f"synthetic_indicator_{i}"), S(technique)))
+        space.add_atom(E(S("technique"), S(technique), S(rng.choice(TACTICS))))
+        space.add_atom(E(S("severity"), S(technique), ValueAtom(rng.choice(SEVERITIES))))
+    return metta
+
+
+def build_corpus(size, extra_indicators, seed=0):
+    """Synthetic alerts: known indicators, synthetic indicators, FAQs and a few novel ones."""
+    rng = random.Random(seed)
+    alerts = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.1:
+            alerts.append(rng.choice(FAQS))
+            continue
+        indicators = rng.sample(KNOWN_INDICATORS, rng.randint(1, 3))
+        if extra_indicators:
+            indicators.append(f"synthetic_indicator_{rng.randrange(extra_indicators)}")
+        if roll > 0.95:
+            indicators.append(f"novel_indicator_{i}")
+        alerts.append(f"Alert on host-{rng.randrange(100)}: observed {' and '.join(indicators)}")
+    return alerts
+
+
+class _CountingSpace:
+    """Proxy for a space reference that counts full scans and pattern queries."""
+
+    def __init__(self, space, counter):
+        self._space = space
+        self._counter = counter
+
+    def get_atoms(self):
+        self._counter["get_atoms"] += 1
+        return self._space.get_atoms()
+
+    def query(self, pattern):
+        self._counter["query"] += 1
+        return self._space.query(pattern)
+
+    def __getattr__(self, name):
+        return getattr(self._space, name)
+
+
+def count_metta_queries(metta):
+    """Count parsed MeTTa queries (``metta.run``), full space scans and direct space queries."""
+    counter = {"run": 0, "get_atoms": 0, "query": 0}
+    run, space = metta.run, metta.space
+
+    def counting_run(*args, **kwargs):
+        counter["run"] += 1
+        return run(*args, **kwargs)
+
+    metta.run = counting_run
+    metta.space = lambda: _CountingSpace(space(), counter)
+    return counter
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "queries": len(ordered),
+        "p50_ms": round(1000 * cuts[49], 3),
+        "p99_ms": round(1000 * cuts[98], 3),
+        "mean_ms": round(1000 * statistics.fmean(ordered), 3),
+        "throughput_qps": round(len(ordered) / elapsed, 2) if elapsed else None,
+    }
+
+
+def stage_counts():
+    return {stage: stats["count"] for stage, stats in metrics.summary().items()}
+
+
+def bench_sync(rag, llm, alerts, classifier):
+    latencies = []
+    start = time.perf_counter()
+    for alert in alerts:
+        t0 = time.perf_counter()
+        process_query(alert, rag, llm, classifier)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def bench_async(rag, llm, alerts, classifier, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(alert):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await aprocess_query(alert, rag, llm, classifier)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(alert) for alert in alerts))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+class _Storage:
+    def set(self, key, value):
+        pass
+
+
+class _Logger:
+    def info(self, *args, **kwargs):
+        pass
+
+    error = info
+
+
+class _Context:
+    """Minimal stand-in for ``uagents.Context`` that records sent messages."""
+
+    def __init__(self):
+        self.session = "bench"
+        self.storage = _Storage()
+        self.logger = _Logger()
+        self.sent = 0
+
+    async def send(self, destination, message):
+        self.sent += 1
+
+
+def _tracked_admission(concurrency, size):
+    from metta.admission import AdmissionController
+
+    class TrackedAdmission(AdmissionController):
+        """No rate limit or shedding; exposes each queued job's future on its context."""
+
+        def submit(self, priority, job):
+            future = super().submit(priority, job)
+            job.args[0].answered = future
+            return future
+
+    return TrackedAdmission(concurrency=concurrency, max_queue=size + 1, degrade_depth=size + 1)
+
+
+async def bench_handle_message(agent_module, alerts, concurrency):
+    from uagents_core.contrib.protocols.chat import ChatMessage, TextContent
+    from uuid import uuid4
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    agent_module.admission = _tracked_admission(concurrency, len(alerts))
+
+    async def one(alert):
+        message = ChatMessage(
+            timestamp=datetime.now(timezone.utc),
+            msg_id=uuid4(),
+            content=[TextContent(type="text", text=alert)],
+        )
+        async with semaphore:
+            t0 = time.perf_counter()
+            ctx = _Context()
+            await agent_module.handle_message(ctx, "bench-sender", message)
+            # handle_message only queues the answer; wait until it has been sent
+            if getattr(ctx, "answered", None) is not None:
+                await ctx.answered
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(alert) for alert in alerts))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def load_agent_module(workdir):
+    """Import ``agent`` with its on-disk stores redirected to ``workdir``; None if uAgents is missing."""
+    os.environ.setdefault("KNOWLEDGE_STORE", os.path.join(workdir, "learned.db"))
+    os.environ.setdefault("LLM_CACHE_PATH", os.path.join(workdir, "llm_cache.db"))
+    try:
+        import agent
+    except ImportError as e:
+        print(f"Skipping handle_message benchmark: {e}", file=sys.stderr)
+        return None
+    return agent
+
+
+def setup(size, use_index, args):
+    """Fresh graph, query counter, ``IncidentRAG`` and classifier for one benchmark mode."""
+    metta = build_graph(size, seed=args.seed)
+    counter = count_metta_queries(metta)
+    start = time.perf_counter()
+    rag = IncidentRAG(metta, use_index=use_index)
+    classifier = LocalClassifier(rag) if args.local_classifier else None
+    return metta, counter, rag, classifier, time.perf_counter() - start
+
+
+def reset_counts(counter):
+    metrics.reset()
+    for name in counter:
+        counter[name] = 0
+
+
+def space_counts(counter):
+    return {
+        "metta_runs": counter["run"],
+        "space_queries": counter["query"],
+        "space_scans": counter["get_atoms"],
+    }
+
+
+def run(args):
+    results = {
+        "started": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "runs": [],
+    }
+    workdir = tempfile.mkdtemp(prefix="incident-bench-")
+    agent_module = load_agent_module(workdir) if args.handle_message else None
+
+    for size in args.sizes:
+        for use_index in args.index:
+            alerts = build_corpus(args.queries, size, seed=args.seed)
+            # Each mode gets its own graph: learned indicators and index state
+            # from one run must not make the next one look faster.
+            metta, counter, rag, classifier, setup_s = setup(size, use_index, args)
+            run_info = {
+                "extra_indicators": size,
+                "atoms": len(metta.space().get_atoms()),
+                "index": use_index,
+                "setup_s": round(setup_s, 4),
+            }
+
+            reset_counts(counter)
+            llm = FakeLLM(args.latency_ms / 1000)
+            run_info["process_query"] = bench_sync(rag, llm, alerts, classifier)
+            run_info["process_query"]["llm_calls"] = llm.calls
+            run_info["process_query"].update(space_counts(counter))
+            run_info["process_query"]["stage_counts"] = stage_counts()
+
+            metta, counter, rag, classifier, _ = setup(size, use_index, args)
+            reset_counts(counter)
+            allm = FakeAsyncLLM(args.latency_ms / 1000)
+            run_info["aprocess_query"] = asyncio.run(
+                bench_async(rag, allm, alerts, classifier, args.concurrency)
+            )
+            run_info["aprocess_query"]["llm_calls"] = allm.calls
+            run_info["aprocess_query"].update(space_counts(counter))
+
+            if agent_module is not None:
+                metta, counter, rag, classifier, _ = setup(size, use_index, args)
+                agent_module.rag = rag
+                agent_module.classifier = classifier
+                agent_module.llm = FakeAsyncLLM(args.latency_ms / 1000)
+                # The runtime is normally built by the startup handler; this one is injected
+                agent_module.runtime_ready.set()
+                reset_counts(counter)
+                run_info["handle_message"] = asyncio.run(
+                    bench_handle_message(agent_module, alerts, args.concurrency)
+                )
+                run_info["handle_message"].update(space_counts(counter))
+
+            # ru_maxrss is in KiB on Linux and a process-wide high-water mark
+            run_info["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            results["runs"].append(run_info)
+            print(
+                f"extra={size:>6} index={use_index!s:<5} "
+                f"p50={run_info['process_query']['p50_ms']}ms p99={run_info['process_query']['p99_ms']}ms "
+                f"async_qps={run_info['aprocess_query']['throughput_qps']} "
+                f"metta_runs={run_info['process_query']['metta_runs']} "
+                f"space_queries={run_info['process_query']['space_queries']} "
+                f"space_scans={run_info['process_query']['space_scans']} rss={run_info['peak_rss_mb']}MB"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000],
+                        help="synthetic indicator chains (3 atoms each) added on top of the built-in graph")
+    parser.add_argument("--queries", type=int, default=200, help="alerts per run")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="artificial latency per fake LLM call")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent queries for the async runs")
+    parser.add_argument("--index", type=lambda v: v.lower() in ("1", "true", "yes"), nargs="+",
+                        default=[False, True], help="run with the knowledge index off and/or on")
+    parser.add_argument("--local-classifier", action="store_true", help="use LocalClassifier before the LLM")
+    parser.add_argument("--handle-message", action="store_true", help="also drive agent.handle_message")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -1,6 +1,40 @@
 # __init__.py
-from .knowledge import initialize_knowledge_graph
-from .incidentrag import IncidentRAG
-from .utils import LLM, process_query
+# Exports are imported on first use, so e.g. ``from metta import IncidentRAG``
+# does not pay for openai/httpx (pulled in by ``utils``) unless they are needed.
+import importlib
 
-__all__ = ['initialize_knowledge_graph', 'IncidentRAG', 'LLM', 'process_query']
+# ``metrics`` shares its name with its submodule, so it is bound eagerly
+# (the module is stdlib-only)
+from .metrics import Metrics, metrics, start_metrics_server
+
+_LAZY = {
+    'initialize_knowledge_graph': 'knowledge',
+    'load_attack_bundle': 'attack',
+    'IncidentRAG': 'incidentrag',
+    'KnowledgeIndex': 'index',
+    'ResponsePlanView': 'plans',
+    'KnowledgeStore': 'store',
+    'CompletionCache': 'cache',
+    'LocalClassifier': 'classifier',
+    'CorrelationEngine': 'correlation',
+    'LLM': 'utils',
+    'AsyncLLM': 'utils',
+    'process_query': 'utils',
+    'aprocess_query': 'utils',
+    'astream_query': 'utils',
+    'WorkerPool': 'workers',
+}
+
+__all__ = ['initialize_knowledge_graph', 'load_attack_bundle', 'IncidentRAG', 'KnowledgeIndex', 'ResponsePlanView', 'KnowledgeStore', 'CompletionCache', 'Metrics', 'metrics', 'start_metrics_server', 'LocalClassifier', 'CorrelationEngine', 'LLM', 'AsyncLLM', 'process_query', 'aprocess_query', 'astream_query', 'WorkerPool']
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
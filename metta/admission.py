@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+
+from .metrics import metrics
+from .plans import SEVERITY_ORDER
+
+logger = logging.getLogger(__name__)
+
+# Queue priority (lower runs first) for findings without a severity
+RESPONSE_PRIORITY = len(SEVERITY_ORDER)
+FAQ_PRIORITY = len(SEVERITY_ORDER) + 1
+
+
+def priority_of(findings):
+    """Queue priority from ``local_findings``: critical indicators first, FAQs last."""
+    if findings.get("intent") == "faq":
+        return FAQ_PRIORITY
+    severity = findings.get("severity")
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else RESPONSE_PRIORITY
+
+
+class RateLimiter:
+    """Per-sender token buckets: ``rate`` requests per second with bursts up to ``burst``.
+
+    At most ``max_senders`` buckets are kept; the least recently seen is
+    dropped first, which at worst gives that sender a fresh full bucket.
+    """
+
+    def __init__(self, rate=1.0, burst=5, max_senders=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_senders = max_senders
+        self._buckets = OrderedDict()
+
+    def acquire(self, sender, now=None):
+        """Take one token for ``sender``; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.pop(sender, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[sender] = (tokens, now)
+        while len(self._buckets) > self.max_senders:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """Bounded priority queue in front of the full (LLM) pipeline.
+
+    ``throttle`` applies the per-sender rate limit. ``admit`` then decides
+    from the current queue depth: ``"rejected"`` when ``max_queue`` requests
+    are already waiting, ``"degraded"`` (answer graph-only) when at least
+    ``degrade_depth`` are waiting and the request is not critical, otherwise
+    ``"queued"``. Queued jobs run ``concurrency`` at a time, most severe first
+    and in arrival order within a severity.
+    """
+
+    def __init__(self, concurrency=8, max_queue=200, degrade_depth=50, rate_limiter=None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.degrade_depth = degrade_depth
+        self.rate_limiter = rate_limiter
+        self.stats = {"queued": 0, "degraded": 0, "rejected": 0, "limited": 0}
+        self._queue = None
+        self._workers = []
+        self._order = itertools.count()
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def throttle(self, sender):
+        """Seconds ``sender`` should wait before retrying, or 0 if the request may proceed."""
+        wait = self.rate_limiter.acquire(sender) if self.rate_limiter is not None else 0.0
+        if wait:
+            self.stats["limited"] += 1
+        return wait
+
+    def admit(self, priority):
+        """Return ``(decision, retry_after)``; ``retry_after`` is an estimate in seconds for rejections."""
+        depth = self.depth
+        if depth >= self.max_queue:
+            self.stats["rejected"] += 1
+            return "rejected", max(1.0, depth / self.concurrency)
+        if depth >= self.degrade_depth and priority > 0:
+            self.stats["degraded"] += 1
+            return "degraded", 0.0
+        return "queued", 0.0
+
+    def submit(self, priority, job):
+        """Queue ``job`` (a coroutine function) without waiting; returns a future for its result.
+
+        The handler can return straight away, so later, more severe requests
+        are still read and can overtake queued ones.
+        """
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+        future = asyncio.get_running_loop().create_future()
+        self.stats["queued"] += 1
+        self._queue.put_nowait((priority, next(self._order), time.perf_counter(), job, future))
+        return future
+
+    async def _work(self):
+        while True:
+            _, _, queued_at, job, future = await self._queue.get()
+            metrics.observe("admission.wait", time.perf_counter() - queued_at)
+            try:
+                result = await job()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                logger.error("Queued job failed: %s", e)
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        for worker in self._workers:
+            worker.cancel()
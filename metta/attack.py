@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import os
+from hyperon import MeTTa, E, S, ValueAtom
+
+try:
+    import ijson
+except ImportError:  # fall back to a full json.load of the bundle
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_stix_objects(path):
+    """Yield STIX objects from a bundle.
+
+    Objects are streamed when the optional ijson package is installed;
+    otherwise the whole bundle is read with ``json.load``.
+    """
+    with open(path, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "objects.item")
+        else:
+            yield from json.load(f).get("objects", [])
+
+
+def _external_id(obj):
+    for ref in obj.get("external_references", []):
+        if ref.get("source_name") == "mitre-attack" and ref.get("external_id"):
+            return ref["external_id"]
+    return None
+
+
+def _active(obj):
+    return not obj.get("revoked") and not obj.get("x_mitre_deprecated")
+
+
+def parse_attack_bundle(path):
+    """Turn an ATT&CK STIX bundle into (relation, subject, value, is_value) triples.
+
+    Emits technique → tactic, tactic → phase, technique/mitigation names,
+    technique → mitigation and technique → data source facts.
+    """
+    stix_ids = {}
+    tactic_ids = {}
+    technique_phases = []
+    mitigates = []
+    triples = []
+
+    for obj in _iter_stix_objects(path):
+        obj_type = obj.get("type")
+        if obj_type == "relationship":
+            if obj.get("relationship_type") == "mitigates" and _active(obj):
+                mitigates.append((obj["source_ref"], obj["target_ref"]))
+            continue
+        if obj_type not in ("attack-pattern", "x-mitre-tactic", "course-of-action") or not _active(obj):
+            continue
+        external_id = _external_id(obj)
+        if not external_id:
+            continue
+        stix_ids[obj["id"]] = external_id
+
+        if obj_type == "x-mitre-tactic":
+            shortname = obj.get("x_mitre_shortname", "")
+            tactic_ids[shortname] = external_id
+            triples.append(("tactic", external_id, shortname.replace("-", "_") + "_phase", True))
+            triples.append(("tactic_name", external_id, obj.get("name", ""), True))
+        elif obj_type == "attack-pattern":
+            triples.append(("technique_name", external_id, obj.get("name", ""), True))
+            for phase in obj.get("kill_chain_phases", []):
+                if phase.get("kill_chain_name") == "mitre-attack":
+                    technique_phases.append((external_id, phase["phase_name"]))
+            for source in obj.get("x_mitre_data_sources", []):
+                triples.append(("data_source", external_id, source, True))
+        else:
+            triples.append(("mitigation_name", external_id, obj.get("name", ""), True))
+
+    # Tactics and relationship endpoints may appear anywhere in the bundle,
+    # so cross-references are resolved once everything has been read.
+    for technique, shortname in technique_phases:
+        if shortname in tactic_ids:
+            triples.append(("technique", technique, tactic_ids[shortname], False))
+    for source_ref, target_ref in mitigates:
+        if source_ref in stix_ids and target_ref in stix_ids:
+            triples.append(("mitigation", stix_ids[target_ref], stix_ids[source_ref], False))
+    return triples
+
+
+def _add_triples(metta: MeTTa, triples):
+    space = metta.space()
+    for relation, subject, value, is_value in triples:
+        space.add_atom(E(S(relation), S(subject), ValueAtom(value) if is_value else S(value)))
+
+
+def load_attack_bundle(metta: MeTTa, bundle_path, snapshot_dir=None):
+    """Load a local MITRE ATT&CK STIX bundle (e.g. enterprise-attack.json) into the space.
+
+    When ``snapshot_dir`` is given, the parsed facts are cached there keyed by
+    the bundle's SHA-256, and later loads of the same file read the snapshot
+    instead of re-parsing the bundle. Returns the number of atoms added.
+    """
+    snapshot_path = None
+    triples = None
+    if snapshot_dir:
+        digest = _file_sha256(bundle_path)
+        snapshot_path = os.path.join(snapshot_dir, f"attack-{digest[:16]}.json")
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") == SNAPSHOT_VERSION and snapshot.get("sha256") == digest:
+                triples = [tuple(triple) for triple in snapshot["atoms"]]
+                logger.info("Loaded ATT&CK snapshot: %s", snapshot_path)
+
+    if triples is None:
+        triples = parse_attack_bundle(bundle_path)
+        if snapshot_path:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            tmp_path = snapshot_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"version": SNAPSHOT_VERSION, "sha256": digest, "atoms": triples},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, snapshot_path)
+            logger.info("Wrote ATT&CK snapshot: %s", snapshot_path)
+
+    _add_triples(metta, triples)
+    return len(triples)
@@ -0,0 +1,204 @@
+"""Batch triage of SIEM alert exports.
+
+Streams alerts from a JSONL or CSV file, extracts indicators and assets
+locally, resolves the knowledge-graph portion in bulk per chunk and asks the
+LLM for one narrative per distinct indicator/asset signature. Results are
+written as JSONL as each chunk completes, so memory stays bounded by the
+chunk size and the number of distinct indicators/signatures rather than by
+the input size.
+
+    python -m metta.batch alerts.jsonl -o triage.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+from collections import OrderedDict
+from itertools import islice
+
+from hyperon import MeTTa
+
+from .classifier import LocalClassifier
+from .incidentrag import IncidentRAG
+from .knowledge import initialize_knowledge_graph
+from .attack import load_attack_bundle
+from .prompts import final_prompt, max_tokens_for, parse_answer
+from .utils import AsyncLLM, summarize_indicators
+
+logger = logging.getLogger(__name__)
+
+
+def read_alerts(path, text_field="text", file_format="auto"):
+    """Yield ``(alert_id, text, indicators)`` from a JSONL or CSV export.
+
+    ``indicators`` is taken from an ``indicators`` field when present (a list,
+    or a comma/semicolon separated string), otherwise None.
+    """
+    if file_format == "auto":
+        file_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f) if file_format == "csv" else (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, 1):
+            indicators = row.get("indicators")
+            if isinstance(indicators, str):
+                indicators = [i.strip() for i in indicators.replace(";", ",").split(",") if i.strip()]
+            yield row.get("id", number), row.get(text_field, ""), indicators or None
+
+
+class _LRU(OrderedDict):
+    def __init__(self, max_size):
+        super().__init__()
+        self.max_size = max_size
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class BatchTriage:
+    """Bulk graph resolution and per-signature narratives for many alerts."""
+
+    def __init__(self, rag: IncidentRAG, classifier: LocalClassifier, llm=None, max_groups=10000):
+        self.rag = rag
+        self.classifier = classifier
+        self.llm = llm
+        self.resolved = _LRU(max_groups)
+        self.groups = _LRU(max_groups)
+        self.stats = {"alerts": 0, "groups": 0, "narratives": 0, "narrative_errors": 0}
+
+    def _signature(self, text, indicators):
+        """``(indicators, assets)`` of an alert; alerts with the same signature share a group."""
+        if indicators is None:
+            _, indicators, _ = self.classifier.classify(text)
+        return tuple(sorted(set(indicators))), tuple(sorted(self.classifier.detect_assets(text)))
+
+    def _resolve(self, indicators):
+        """Resolve every not-yet-seen indicator of the chunk in one graph call."""
+        pending = {i for i in indicators if i not in self.resolved}
+        if pending:
+            for indicator, entry in self.rag.resolve_indicators(sorted(pending)).items():
+                self.resolved.put(indicator, entry)
+
+    def _group(self, signature):
+        group = self.groups.get(signature)
+        if group is None:
+            indicators, assets = signature
+            resolved = {}
+            for indicator in indicators:
+                if indicator not in self.resolved:
+                    self._resolve([indicator])
+                resolved[indicator] = self.resolved[indicator]
+            group = summarize_indicators(resolved, self.rag, assets)
+            group["narrative"] = None
+            self.groups.put(signature, group)
+            self.stats["groups"] += 1
+        return group
+
+    async def _narrate(self, group, signature, text):
+        """Fill in the group's narrative; a failure leaves it None so the chunk's rows are still written."""
+        indicators, assets = signature
+        findings = dict(group, intent="indicator", indicators=list(indicators), assets=list(assets))
+        try:
+            response = await self.llm.create_completion(
+                final_prompt(text, findings), max_tokens=max_tokens_for(findings), key=("batch", signature)
+            )
+        except Exception as e:
+            logger.warning("Narrative for %s failed: %s", ", ".join(indicators), e)
+            self.stats["narrative_errors"] += 1
+            return
+        group["narrative"] = parse_answer(response, text)["humanized_answer"]
+        self.stats["narratives"] += 1
+
+    async def process_chunk(self, chunk):
+        """Triage one chunk of ``(alert_id, text, indicators)``; returns result rows."""
+        keyed = [(alert_id, text, self._signature(text, indicators)) for alert_id, text, indicators in chunk]
+        self._resolve(i for _, _, (indicators, _) in keyed for i in indicators)
+
+        # Hold this chunk's groups directly: with more distinct signatures
+        # than max_groups, the LRU evicts some before they are narrated.
+        groups, new = {}, {}
+        for _, text, signature in keyed:
+            if signature[0] and signature not in groups:
+                groups[signature] = self._group(signature)
+                if groups[signature]["narrative"] is None:
+                    new[signature] = text
+        if self.llm is not None and new:
+            await asyncio.gather(*(
+                self._narrate(groups[signature], signature, text) for signature, text in new.items()
+            ))
+
+        rows = []
+        for alert_id, text, signature in keyed:
+            group = groups.get(signature, {})
+            rows.append({
+                "id": alert_id,
+                "indicators": list(signature[0]),
+                "assets": list(signature[1]),
+                "techniques": group.get("techniques", []),
+                "phases": group.get("phases", []),
+                "severity": group.get("severity", "unknown"),
+                "response_actions": group.get("response_actions", []),
+                "narrative": group.get("narrative"),
+            })
+        self.stats["alerts"] += len(rows)
+        return rows
+
+    async def run(self, alerts, out, chunk_size=500):
+        """Triage an alert iterator, writing one JSON line per alert to ``out``."""
+        alerts = iter(alerts)
+        while True:
+            chunk = list(islice(alerts, chunk_size))
+            if not chunk:
+                break
+            for row in await self.process_chunk(chunk):
+                out.write(json.dumps(row) + "\n")
+            out.flush()
+            logger.info("Triaged %d alerts in %d groups", self.stats["alerts"], self.stats["groups"])
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triage a SIEM alert export through the incident pipeline.")
+    parser.add_argument("input", help="JSONL or CSV alert export")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto")
+    parser.add_argument("--text-field", default="text", help="field holding the alert text")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--no-llm", action="store_true", help="graph-only results, no narratives")
+    parser.add_argument("--concurrency", type=int, default=8, help="max in-flight LLM calls")
+    parser.add_argument("--attack-bundle", help="local ATT&CK STIX bundle to load")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("METTA_LOG_LEVEL", "WARNING"))
+
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    if args.attack_bundle:
+        load_attack_bundle(metta, args.attack_bundle, os.getenv("ATTACK_SNAPSHOT_DIR", ".cache"))
+    rag = IncidentRAG(metta, use_index=True)
+    llm = None
+    if not args.no_llm:
+        llm = AsyncLLM(api_key=os.getenv("ASI_ONE_API_KEY"), max_in_flight=args.concurrency)
+    triage = BatchTriage(rag, LocalClassifier(rag), llm)
+
+    async def run():
+        out = open(args.output, "w") if args.output != "-" else None
+        try:
+            alerts = read_alerts(args.input, args.text_field, args.format)
+            return await triage.run(alerts, out or sys.stdout, args.chunk_size)
+        finally:
+            if out is not None:
+                out.close()
+            if llm is not None:
+                await llm.close()
+
+    stats = asyncio.run(run())
+    print(f"Done: {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
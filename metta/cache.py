@@ -0,0 +1,153 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    max_tokens INTEGER NOT NULL,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL
+)
+"""
+
+
+def normalize_prompt(prompt):
+    """Lowercase and collapse whitespace so trivially different prompts share a key."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def _ngrams(text, n=3):
+    return {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+
+
+class CompletionCache:
+    """LRU + TTL cache of LLM completions keyed on (normalized prompt, model, max_tokens).
+
+    Exact matches are a dict hit. When ``similarity`` is set, a miss on a
+    lookup made with ``similar=True`` falls back to the most similar cached
+    prompt for the same model and max_tokens whose character-trigram Jaccard
+    score reaches that threshold. With ``path`` the
+    entries are also kept in SQLite and reloaded on start.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0, similarity=None, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.path = path
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(_SCHEMA)
+            self._load()
+
+    @staticmethod
+    def make_key(prompt, model, max_tokens):
+        normalized = normalize_prompt(prompt)
+        return hashlib.sha256(f"{model}\0{max_tokens}\0{normalized}".encode()).hexdigest()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        rows = self._conn.execute(
+            "SELECT key, model, max_tokens, prompt, response, created FROM completions "
+            "WHERE created >= ? ORDER BY created DESC LIMIT ?",
+            (cutoff, self.max_entries),
+        ).fetchall()
+        for key, model, max_tokens, prompt, response, created in reversed(rows):
+            self._entries[key] = (model, max_tokens, prompt, _ngrams(prompt), response, created)
+        with self._conn:
+            self._conn.execute("DELETE FROM completions WHERE created < ?", (cutoff,))
+
+    def _expired(self, entry, now):
+        return now - entry[5] > self.ttl
+
+    def get(self, prompt, model, max_tokens, similar=False):
+        """Return a cached response or None, updating hit/miss counters.
+
+        Only callers passing ``similar=True`` get near-miss matches; prompts
+        whose answer is recorded as knowledge (intent, technique mapping)
+        must match exactly, since ``dns_tunneling`` and ``dns_beaconing``
+        read as similar but need different answers.
+        """
+        key = self.make_key(prompt, model, max_tokens)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._evict(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[4]
+            if similar and self.similarity is not None:
+                match = self._most_similar(normalize_prompt(prompt), model, max_tokens, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.similar_hits += 1
+                    return self._entries[match][4]
+            self.misses += 1
+            return None
+
+    def _most_similar(self, normalized, model, max_tokens, now):
+        grams = _ngrams(normalized)
+        best_key, best_score = None, self.similarity
+        for key, entry in self._entries.items():
+            if entry[0] != model or entry[1] != max_tokens or self._expired(entry, now):
+                continue
+            other = entry[3]
+            score = len(grams & other) / len(grams | other)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, prompt, model, max_tokens, response):
+        """Store a completion, evicting the least recently used entry when full."""
+        key = self.make_key(prompt, model, max_tokens)
+        normalized = normalize_prompt(prompt)
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (model, max_tokens, normalized, _ngrams(normalized), response, created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, max_tokens, normalized, response, created),
+                    )
+
+    def _evict(self, key):
+        self._entries.pop(key, None)
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
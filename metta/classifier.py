@@ -0,0 +1,160 @@
+import difflib
+import re
+from collections import deque
+from .incidentrag import IncidentRAG
+
+# Extra phrasings for the built-in indicators; each indicator subject also
+# matches itself with underscores read as spaces.
+INDICATOR_ALIASES = {
+    "powershell": ["powershell", "pwsh", "encodedcommand"],
+    "scheduled_task": ["scheduled task", "schtasks", "task scheduler"],
+    "smb_traffic": ["smb", "admin share", "admin$", "c$ share"],
+    "rdp_connection": ["rdp", "remote desktop", "mstsc"],
+    "lsass_access": ["lsass", "mimikatz", "credential dump", "procdump"],
+    "file_encryption": ["encrypt", "ransom", "files locked"],
+    "obfuscated_code": ["obfuscat", "base64 encoded"],
+    "registry_modification": ["registry", "reg add", "run key"],
+    "wmi_execution": ["wmi", "wmic"],
+}
+
+# Phrasings for the asset types that carry an ``asset_severity``.
+ASSET_ALIASES = {
+    "domain_controller": ["domain controller", "dc0", "dc1", "dc-"],
+    "file_server": ["file server", "fileserver", "file share"],
+    "database": ["database", "db server", "sql server"],
+    # not "desktop": it would fire on every "remote desktop" (RDP) alert
+    "workstation": ["workstation", "laptop"],
+    "web_server": ["web server", "webserver", "iis", "nginx", "apache"],
+}
+
+# snake_case tokens look like indicator names whether or not the graph knows them
+INDICATOR_TOKEN = re.compile(r"\b[a-z0-9]+(?:_[a-z0-9]+)+\b")
+
+RESPONSE_PATTERN = re.compile(
+    r"\b(how (do|should|can) (i|we)|what (should|do) (i|we)|respond|remediat|contain|mitigat|next steps?)"
+)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping lowercase phrases to indicator names."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase, indicator in patterns.items():
+            self._insert(phrase, indicator)
+        self._link()
+
+    def _insert(self, phrase, indicator):
+        state = 0
+        for char in phrase:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append((len(phrase), indicator))
+
+    def _link(self):
+        # Depth-one states keep their failure link at the root.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """Return matched indicators in order of first occurrence.
+
+        A match must start at a word boundary so short aliases such as
+        ``rdp`` do not fire inside unrelated words.
+        """
+        found = []
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, indicator in self.output[state]:
+                start = end - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and indicator not in found:
+                    found.append(indicator)
+        return found
+
+
+class LocalClassifier:
+    """Rule-based intent and indicator extraction built from the knowledge graph.
+
+    ``classify`` returns ``(intent, indicators, confidence)``; callers fall
+    back to the LLM when the confidence is below ``threshold``.
+    """
+
+    def __init__(self, rag: IncidentRAG, threshold=0.75, faq_cutoff=0.85):
+        self.rag = rag
+        self.threshold = threshold
+        self.faq_cutoff = faq_cutoff
+        self.patterns = {}
+        self.faqs = {}
+        self._automaton = None
+        asset_patterns = {}
+        for asset in rag.list_subjects("asset_severity"):
+            for phrase in [asset, asset.replace("_", " ")] + ASSET_ALIASES.get(asset, []):
+                asset_patterns.setdefault(phrase.lower(), asset)
+        self._assets = KeywordAutomaton(asset_patterns)
+        for indicator in rag.list_subjects("indicator"):
+            self.add_indicator(indicator)
+        for question in rag.list_subjects("faq"):
+            self.add_faq(question)
+
+    def add_indicator(self, indicator, aliases=()):
+        """Register an indicator (and optional aliases); the automaton is rebuilt lazily."""
+        phrases = [indicator, indicator.replace("_", " ")]
+        phrases.extend(INDICATOR_ALIASES.get(indicator, ()))
+        phrases.extend(aliases)
+        for phrase in phrases:
+            self.patterns.setdefault(phrase.lower(), indicator)
+        self._automaton = None
+
+    def add_faq(self, question):
+        self.faqs[question.lower().strip(" ?")] = question
+
+    def match_faq(self, query):
+        """Return the stored FAQ question closest to the query, or None."""
+        matches = difflib.get_close_matches(
+            query.lower().strip(" ?"), list(self.faqs), n=1, cutoff=self.faq_cutoff
+        )
+        return self.faqs[matches[0]] if matches else None
+
+    def detect_assets(self, query):
+        """Asset types mentioned in the query, e.g. ``DC01`` → ``domain_controller``."""
+        return self._assets.find(query.lower())
+
+    def classify(self, query):
+        """Return ``(intent, indicators, confidence)`` for a query.
+
+        Indicator confidence falls with the share of indicator-like tokens
+        (snake_case names) the automaton does not know, so a query naming
+        novel indicators goes to the LLM, which extracts and learns them.
+        """
+        text = query.lower()
+        if self.match_faq(query):
+            return "faq", [], 1.0
+        if self._automaton is None:
+            self._automaton = KeywordAutomaton(self.patterns)
+        indicators = self._automaton.find(text)
+        if indicators:
+            unknown = {
+                token for token in INDICATOR_TOKEN.findall(text)
+                if token not in self.patterns and token not in indicators
+            }
+            return "indicator", indicators, 0.9 * len(indicators) / (len(indicators) + len(unknown))
+        if RESPONSE_PATTERN.search(text):
+            return "response", [], 0.8
+        return "unknown", [], 0.0
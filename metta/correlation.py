@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+# ATT&CK enterprise kill-chain order, using the graph's ``<tactic>_phase`` names.
+PHASE_ORDER = [
+    "reconnaissance_phase",
+    "resource_development_phase",
+    "initial_access_phase",
+    "execution_phase",
+    "persistence_phase",
+    "privilege_escalation_phase",
+    "defense_evasion_phase",
+    "credential_access_phase",
+    "discovery_phase",
+    "lateral_movement_phase",
+    "collection_phase",
+    "command_and_control_phase",
+    "exfiltration_phase",
+    "impact_phase",
+]
+PHASE_RANK = {phase: rank for rank, phase in enumerate(PHASE_ORDER)}
+
+
+class _Campaign:
+    def __init__(self):
+        self.events = deque()
+        self.techniques = Counter()
+        self.tactics = Counter()
+        self.phases = Counter()
+
+    def add(self, event):
+        self.events.append(event)
+        _, techniques, tactics, phases = event
+        self.techniques.update(techniques)
+        self.tactics.update(tactics)
+        self.phases.update(phases)
+
+    def evict_before(self, cutoff, max_events):
+        while self.events and (self.events[0][0] < cutoff or len(self.events) > max_events):
+            _, techniques, tactics, phases = self.events.popleft()
+            for counter, names in ((self.techniques, techniques), (self.tactics, tactics), (self.phases, phases)):
+                for name in names:
+                    counter[name] -= 1
+                    if counter[name] <= 0:
+                        del counter[name]
+
+
+class CorrelationEngine:
+    """Sliding-window record of techniques, tactics and phases per session or asset.
+
+    Each key keeps at most ``max_events`` events from the last ``window``
+    seconds, with running counters updated as events arrive and expire, so
+    the campaign phase is answered from the counters without replaying
+    history. At most ``max_keys`` keys are tracked; the least recently
+    updated is dropped first.
+    """
+
+    def __init__(self, window=1800.0, max_events=1000, max_keys=10000):
+        self.window = window
+        self.max_events = max_events
+        self.max_keys = max_keys
+        self._campaigns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, key, techniques=(), tactics=(), phases=(), now=None):
+        """Record one observation under ``key`` and return the updated campaign state."""
+        now = time.time() if now is None else now
+        event = (now, tuple(set(techniques)), tuple(set(tactics)), tuple(set(phases)))
+        with self._lock:
+            campaign = self._campaigns.get(key)
+            if campaign is None:
+                campaign = self._campaigns[key] = _Campaign()
+                while len(self._campaigns) > self.max_keys:
+                    self._campaigns.popitem(last=False)
+            self._campaigns.move_to_end(key)
+            campaign.add(event)
+            campaign.evict_before(now - self.window, self.max_events)
+            return self._snapshot(key, campaign)
+
+    def observe_all(self, keys, techniques=(), tactics=(), phases=(), now=None):
+        """Record one observation under each of ``keys`` and return their merged campaign state.
+
+        Keying the same event by session, sender and asset links reports
+        that share any of them. The merged state takes the union of phases,
+        tactics and techniques, ``events`` is the largest per-key count (the
+        keys overlap, so counts cannot be added) and ``linked`` lists the
+        other keys that already held earlier events.
+        """
+        now = time.time() if now is None else now
+        states = [self.observe(key, techniques, tactics, phases, now) for key in keys]
+        if not states:
+            return None
+        phases = sorted(
+            {phase for state in states for phase in state["phases"]},
+            key=lambda phase: PHASE_RANK.get(phase, len(PHASE_ORDER)),
+        )
+        ranked = [phase for phase in phases if phase in PHASE_RANK]
+        return {
+            "key": states[0]["key"],
+            "linked": [state["key"] for state in states[1:] if state["events"] > 1],
+            "phase": ranked[-1] if ranked else (phases[-1] if phases else None),
+            "phases": phases,
+            "tactics": sorted({tactic for state in states for tactic in state["tactics"]}),
+            "techniques": sorted({technique for state in states for technique in state["techniques"]}),
+            "events": max(state["events"] for state in states),
+            "first_seen": min(state["first_seen"] for state in states),
+            "last_seen": max(state["last_seen"] for state in states),
+        }
+
+    def state(self, key, now=None):
+        """Return the current campaign state for ``key``, or None if nothing is in the window."""
+        now = time.time() if now is None else now
+        with self._lock:
+            campaign = self._campaigns.get(key)
+            if campaign is None:
+                return None
+            campaign.evict_before(now - self.window, self.max_events)
+            if not campaign.events:
+                del self._campaigns[key]
+                return None
+            return self._snapshot(key, campaign)
+
+    @staticmethod
+    def _snapshot(key, campaign):
+        phases = sorted(campaign.phases, key=lambda phase: PHASE_RANK.get(phase, len(PHASE_ORDER)))
+        ranked = [phase for phase in phases if phase in PHASE_RANK]
+        return {
+            "key": key,
+            "phase": ranked[-1] if ranked else (phases[-1] if phases else None),
+            "phases": phases,
+            "tactics": sorted(campaign.tactics),
+            "techniques": sorted(campaign.techniques),
+            "events": len(campaign.events),
+            "first_seen": campaign.events[0][0] if campaign.events else None,
+            "last_seen": campaign.events[-1][0] if campaign.events else None,
+        }
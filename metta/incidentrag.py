@@ -1,73 +1,184 @@
+import logging
 import re
-from hyperon import MeTTa, E, S, ValueAtom
+from hyperon import MeTTa, E, S, ValueAtom, AtomKind
+from .index import KnowledgeIndex, atom_text, match_space, match_subjects
+from .metrics import metrics
+from .plans import ResponsePlanView
+
+logger = logging.getLogger(__name__)
 
 class IncidentRAG:
-    def __init__(self, metta_instance: MeTTa):
+    def __init__(self, metta_instance: MeTTa, use_index=False, check_index=False, store=None, materialize=False):
         self.metta = metta_instance
+        self.store = store
+        self.check_index = check_index
+        self.index = KnowledgeIndex.from_space(metta_instance) if use_index else None
+        self.listeners = []
+        self.plans = ResponsePlanView(self) if materialize else None
+
+    def _indexed(self, relation, subject):
+        """Serve a lookup from the index, cross-checking the space in check mode."""
+        values = self.index.lookup(relation, subject)
+        if self.check_index:
+            stored = match_space(self.metta, relation, subject)
+            if set(values) != set(stored):
+                logger.warning("Index mismatch for (%s %s): index=%s space=%s", relation, subject, values, stored)
+                return stored
+        return values
 
+    @metrics.timed("metta.indicator")
     def query_indicator(self, indicator):
         """Find MITRE techniques linked to an indicator."""
         indicator = indicator.strip('"')
+        if self.index is not None:
+            return self._indexed("indicator", indicator)
         query_str = f'!(match &self (indicator {indicator} $technique) $technique)'
         results = self.metta.run(query_str)
-        print(f"Query indicator: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query indicator: %s -> %s", query_str, results)
         
-        unique_techniques = list(set(str(r[0]) for r in results if r and len(r) > 0)) if results else []
+        unique_techniques = list(set(str(atom) for r in results for atom in r)) if results else []
         return unique_techniques
 
+    @metrics.timed("metta.tactic")
     def get_tactic(self, technique):
         """Find tactic for a technique."""
         technique = technique.strip('"')
+        if self.index is not None:
+            return self._indexed("technique", technique)
         query_str = f'!(match &self (technique {technique} $tactic) $tactic)'
         results = self.metta.run(query_str)
-        print(f"Query tactic: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query tactic: %s -> %s", query_str, results)
         
-        return [str(r[0]) for r in results if r and len(r) > 0] if results else []
+        return [str(atom) for r in results for atom in r] if results else []
 
+    @metrics.timed("metta.phase")
     def get_attack_phase(self, tactic):
         """Find attack phase for a tactic."""
         tactic = tactic.strip('"')
+        if self.index is not None:
+            return self._indexed("tactic", tactic)
         query_str = f'!(match &self (tactic {tactic} $phase) $phase)'
         results = self.metta.run(query_str)
-        print(f"Query phase: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query phase: %s -> %s", query_str, results)
         
-        return [r[0].get_object().value for r in results if r and len(r) > 0] if results else []
+        return [atom.get_object().value for r in results for atom in r] if results else []
 
+    @metrics.timed("metta.response")
     def get_response_actions(self, attack_pattern):
         """Find response actions for an attack pattern."""
         attack_pattern = attack_pattern.strip('"')
+        if self.index is not None:
+            return self._indexed("response", attack_pattern)
         query_str = f'!(match &self (response {attack_pattern} $actions) $actions)'
         results = self.metta.run(query_str)
-        print(f"Query response: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query response: %s -> %s", query_str, results)
         
-        return [r[0].get_object().value for r in results if r and len(r) > 0] if results else []
+        return [atom.get_object().value for r in results for atom in r] if results else []
 
+    @metrics.timed("metta.severity")
     def get_severity(self, technique):
         """Find severity for a technique."""
         technique = technique.strip('"')
+        if self.index is not None:
+            return self._indexed("severity", technique)
         query_str = f'!(match &self (severity {technique} $sev) $sev)'
         results = self.metta.run(query_str)
-        print(f"Query severity: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query severity: %s -> %s", query_str, results)
         
-        return [r[0].get_object().value for r in results if r and len(r) > 0] if results else []
+        return [atom.get_object().value for r in results for atom in r] if results else []
 
+    @metrics.timed("metta.asset_severity")
+    def get_asset_severity(self, asset_type):
+        """Find base severity for an asset type."""
+        asset_type = asset_type.strip('"')
+        if self.index is not None:
+            return self._indexed("asset_severity", asset_type)
+        query_str = f'!(match &self (asset_severity {asset_type} $sev) $sev)'
+        results = self.metta.run(query_str)
+        logger.debug("Query asset severity: %s -> %s", query_str, results)
+        
+        return [atom.get_object().value for r in results for atom in r] if results else []
+
+    @metrics.timed("metta.faq")
     def query_faq(self, question):
         """Retrieve FAQ answers."""
+        if self.index is not None:
+            answers = self._indexed("faq", question)
+            return answers[0] if answers else None
         query_str = f'!(match &self (faq "{question}" $answer) $answer)'
         results = self.metta.run(query_str)
-        print(f"Query FAQ: {query_str}")
-        print(f"Results: {results}")
+        logger.debug("Query FAQ: %s -> %s", query_str, results)
         
         return results[0][0].get_object().value if results and results[0] else None
 
-    def add_knowledge(self, relation_type, subject, object_value):
-        """Add new knowledge dynamically."""
+    @metrics.timed("metta.resolve_indicators")
+    def resolve_indicators(self, indicators):
+        """Resolve indicator → technique → tactic/severity → phase for a batch of indicators.
+
+        Returns a dict keyed by indicator, each holding ordered, de-duplicated
+        ``techniques``, ``tactics``, ``severities`` and ``phases`` lists.
+        Without the index each hop is one targeted space query, memoized for
+        the batch so techniques and tactics shared between indicators are
+        only looked up once.
+        """
+        wanted = [indicator.strip('"') for indicator in indicators]
+        if self.index is not None:
+            lookup = self._indexed
+        else:
+            memo = {}
+
+            def lookup(relation, subject):
+                key = (relation, subject)
+                if key not in memo:
+                    memo[key] = match_space(self.metta, relation, subject)
+                return memo[key]
+        logger.debug("Resolved indicators: %s", wanted)
+
+        resolved = {}
+        for indicator in wanted:
+            entry = {"techniques": [], "tactics": [], "severities": [], "phases": []}
+            for technique in lookup("indicator", indicator):
+                entry["techniques"].append(technique)
+                entry["severities"].extend(lookup("severity", technique))
+                for tactic in lookup("technique", technique):
+                    entry["tactics"].append(tactic)
+                    entry["phases"].extend(lookup("tactic", tactic))
+            resolved[indicator] = {key: list(dict.fromkeys(values)) for key, values in entry.items()}
+        return resolved
+
+    def list_subjects(self, relation):
+        """Return every subject that has at least one fact of the given relation."""
+        if self.index is None:
+            return match_subjects(self.metta, relation)
+        return [subject for rel, subject in list(self.index.facts) if rel == relation]
+
+    def subscribe(self, listener):
+        """Call ``listener(relation, subject, value)`` after every ``add_knowledge``."""
+        self.listeners.append(listener)
+
+    def verify_index(self):
+        """Check the index against the space; returns mismatch descriptions (empty when consistent)."""
+        if self.index is None:
+            return []
+        return self.index.verify(self.metta)
+
+    def add_knowledge(self, relation_type, subject, object_value, persist=True):
+        """Add new knowledge dynamically.
+
+        ``persist=False`` skips the store, for facts that were read from it.
+        """
         if isinstance(object_value, str):
             object_value = ValueAtom(object_value)
         self.metta.space().add_atom(E(S(relation_type), S(subject), object_value))
+        if self.index is not None:
+            self.index.add(relation_type, subject, atom_text(object_value))
+        if persist and self.store is not None:
+            self.store.append(
+                relation_type,
+                subject,
+                atom_text(object_value),
+                is_value=object_value.get_metatype() == AtomKind.GROUNDED,
+            )
+        for listener in self.listeners:
+            listener(relation_type, subject, atom_text(object_value))
         return f"Added {relation_type}: {subject} → {object_value}"
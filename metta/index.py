@@ -0,0 +1,84 @@
+from hyperon import MeTTa, E, S, V, AtomKind
+
+# Two-argument fact types held in the knowledge graph.
+RELATIONS = (
+    "indicator", "technique", "tactic", "severity", "response", "asset_severity", "faq",
+    "technique_name", "tactic_name", "mitigation", "mitigation_name", "data_source",
+)
+
+
+def atom_text(atom):
+    """Return the plain string value of a symbol or grounded atom."""
+    kind = atom.get_metatype()
+    if kind == AtomKind.GROUNDED:
+        return str(atom.get_object().value)
+    if kind == AtomKind.SYMBOL:
+        return atom.get_name()
+    return str(atom)
+
+
+class KnowledgeIndex:
+    """Dict-backed (relation, subject) → values index over a MeTTa space.
+
+    The space stays the source of truth; the index is a read cache that is
+    built with one scan and kept current by writing through on every add.
+    """
+
+    def __init__(self, relations=RELATIONS):
+        self.relations = frozenset(relations)
+        self.facts = {}
+
+    @classmethod
+    def from_space(cls, metta: MeTTa, relations=RELATIONS):
+        """Build an index with a single pass over the atoms in the space."""
+        index = cls(relations)
+        index.rebuild(metta)
+        return index
+
+    def rebuild(self, metta: MeTTa):
+        """Drop all entries and re-scan the space."""
+        self.facts = {}
+        for atom in metta.space().get_atoms():
+            if atom.get_metatype() != AtomKind.EXPR:
+                continue
+            children = atom.get_children()
+            if len(children) != 3 or children[0].get_metatype() != AtomKind.SYMBOL:
+                continue
+            self.add(children[0].get_name(), atom_text(children[1]), atom_text(children[2]))
+
+    def add(self, relation, subject, value):
+        """Record one (relation subject value) fact; ignores untracked relations."""
+        if relation not in self.relations:
+            return
+        values = self.facts.setdefault((relation, subject), [])
+        if value not in values:
+            values.append(value)
+
+    def lookup(self, relation, subject):
+        """Return the values stored for (relation, subject), in insertion order."""
+        return list(self.facts.get((relation, subject), ()))
+
+    def verify(self, metta: MeTTa):
+        """Compare the index against the space; return a list of mismatch descriptions."""
+        expected = KnowledgeIndex.from_space(metta, self.relations)
+        mismatches = []
+        for key in set(expected.facts) | set(self.facts):
+            indexed = set(self.facts.get(key, ()))
+            stored = set(expected.facts.get(key, ()))
+            if indexed != stored:
+                mismatches.append(f"{key[0]} {key[1]}: index={sorted(indexed)} space={sorted(stored)}")
+        return mismatches
+
+
+def match_space(metta: MeTTa, relation, subject):
+    """Query the space directly for (relation subject $value) without parsing MeTTa text."""
+    value = V("value")
+    results = metta.space().query(E(S(relation), S(subject), value))
+    return [atom_text(bindings.resolve(value)) for bindings in results.iterator()]
+
+
+def match_subjects(metta: MeTTa, relation):
+    """Query the space for every subject of (relation $subject $value), in first-seen order."""
+    subject = V("subject")
+    results = metta.space().query(E(S(relation), subject, V("value")))
+    return list(dict.fromkeys(atom_text(bindings.resolve(subject)) for bindings in results.iterator()))
@@ -0,0 +1,152 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th quantile (inf when in the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Per-stage latency histograms for the query pipeline."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block and record it under ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """Decorator form of ``span``."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def drain(self):
+        """Return the recorded histograms as plain picklable data and clear them.
+
+        Worker processes ship this to the parent, which adds it to its own
+        registry with ``merge``.
+        """
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+        return {stage: (h.counts, h.total, h.count) for stage, h in histograms.items()}
+
+    def merge(self, drained):
+        """Add histograms returned by another registry's ``drain``."""
+        with self._lock:
+            for stage, (counts, total, count) in drained.items():
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram(self.buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.total += total
+                histogram.count += count
+
+    def summary(self):
+        """Return ``{stage: {count, avg_ms, p50_ms, p99_ms}}`` for periodic logging."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "avg_ms": round(1000 * h.total / h.count, 3) if h.count else 0.0,
+                    "p50_ms": 1000 * h.quantile(0.5),
+                    "p99_ms": 1000 * h.quantile(0.99),
+                }
+                for stage, h in sorted(self.histograms.items())
+            }
+
+    def render_prometheus(self, name="incident_stage_seconds"):
+        """Render all histograms in the Prometheus text exposition format."""
+        lines = [f"# HELP {name} Latency of incident pipeline stages.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.total}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=metrics):
+    """Serve ``registry`` as Prometheus text on ``/metrics`` from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
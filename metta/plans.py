@@ -0,0 +1,112 @@
+SEVERITY_ORDER = ["critical", "high", "medium", "low"]
+
+
+def max_severity(severities):
+    """Highest known severity in ``severities``, or "unknown"."""
+    for sev in SEVERITY_ORDER:
+        if sev in severities:
+            return sev
+    return "unknown"
+
+
+def attack_pattern(phases):
+    """Response-action subject for a finding: its first phase without the ``_phase`` suffix."""
+    pattern = phases[0] if phases else "execution"
+    return pattern.replace("_phase", "")
+
+
+def merge_entries(entries):
+    """Union ``resolve_indicators`` entries, keeping first-seen order."""
+    merged = {"techniques": [], "tactics": [], "severities": [], "phases": []}
+    for entry in entries:
+        for key, values in merged.items():
+            values.extend(entry[key])
+    return {key: list(dict.fromkeys(values)) for key, values in merged.items()}
+
+
+class ResponsePlanView:
+    """Materialized indicator → techniques/tactics/phases/severity/response plan.
+
+    Built once from the graph and kept current by subscribing to
+    ``IncidentRAG.add_knowledge``: each new fact only refreshes the indicators
+    that depend on it (through the technique or tactic it names) or the one
+    cached response or asset severity it changes.
+    """
+
+    def __init__(self, rag):
+        self.rag = rag
+        self.entries = {}
+        self.responses = {}
+        self.asset_severity = {}
+        self._by_technique = {}
+        self._by_tactic = {}
+        self.rebuild()
+        rag.subscribe(self.on_fact)
+
+    def rebuild(self):
+        self.entries = {}
+        self.responses = {}
+        self._by_technique = {}
+        self._by_tactic = {}
+        self._refresh(self.rag.list_subjects("indicator"))
+        self.asset_severity = {
+            asset: max_severity(self.rag.get_asset_severity(asset))
+            for asset in self.rag.list_subjects("asset_severity")
+        }
+
+    def _refresh(self, indicators):
+        indicators = list(indicators)
+        if not indicators:
+            return
+        for indicator, entry in self.rag.resolve_indicators(indicators).items():
+            self._unlink(indicator)
+            self.entries[indicator] = entry
+            for technique in entry["techniques"]:
+                self._by_technique.setdefault(technique, set()).add(indicator)
+            for tactic in entry["tactics"]:
+                self._by_tactic.setdefault(tactic, set()).add(indicator)
+
+    def _unlink(self, indicator):
+        entry = self.entries.pop(indicator, None)
+        if entry is None:
+            return
+        for technique in entry["techniques"]:
+            self._by_technique.get(technique, set()).discard(indicator)
+        for tactic in entry["tactics"]:
+            self._by_tactic.get(tactic, set()).discard(indicator)
+
+    def on_fact(self, relation, subject, value):
+        """Update only the entries affected by one newly added fact."""
+        if relation == "indicator":
+            self._refresh([subject])
+        elif relation in ("technique", "severity"):
+            self._refresh(self._by_technique.get(subject, ()))
+        elif relation == "tactic":
+            self._refresh(self._by_tactic.get(subject, ()))
+        elif relation == "response":
+            self.responses.pop(subject, None)
+        elif relation == "asset_severity":
+            self.asset_severity[subject] = max_severity(self.rag.get_asset_severity(subject))
+
+    def unmapped(self, indicators):
+        """Indicators with no known technique."""
+        return [i for i in indicators if not self.entries.get(i.strip('"'), {}).get("techniques")]
+
+    def _response_actions(self, pattern):
+        actions = self.responses.get(pattern)
+        if actions is None:
+            actions = self.responses[pattern] = self.rag.get_response_actions(pattern)
+        return actions
+
+    def plan(self, indicators, assets=()):
+        """Combined plan for a set of indicators, raised to the severity of any listed asset types."""
+        empty = {"techniques": [], "tactics": [], "severities": [], "phases": []}
+        merged = merge_entries(self.entries.get(i.strip('"'), empty) for i in indicators)
+        asset_severities = [self.asset_severity[a] for a in assets if a in self.asset_severity]
+        return {
+            "techniques": merged["techniques"],
+            "tactics": merged["tactics"],
+            "phases": merged["phases"],
+            "severity": max_severity(merged["severities"] + asset_severities),
+            "response_actions": list(self._response_actions(attack_pattern(merged["phases"]))),
+        }
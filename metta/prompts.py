@@ -0,0 +1,168 @@
+"""Compact, token-budgeted prompts for the final completion and a tolerant answer parser."""
+import json
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a characters-per-token estimate
+    tiktoken = None
+
+# Input tokens allowed for the findings context of a final prompt
+CONTEXT_BUDGET = 300
+
+# Output tokens for the final answer by intent
+MAX_TOKENS = {"indicator": 350, "response": 250, "faq": 150, "unknown": 200}
+
+# Context fields dropped first when over budget (the query and severity are always kept)
+_TRIM_ORDER = ("campaign", "assets", "indicators", "actions", "phases", "answer", "techniques")
+_MAX_ITEMS = 5
+
+_INSTRUCTIONS = {
+    "indicator": "Give a prioritized, actionable incident response for a security analyst.",
+    "response": "Give clear, actionable incident response guidance.",
+    "faq": "Rewrite the answer for a security analyst in a professional tone.",
+    "unknown": "No knowledge-graph match; give general incident response guidance.",
+}
+_JSON_FORMAT = 'Reply with JSON only: {"question": "<the question, restated briefly>", "answer": "<your response>"}'
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, else an estimate of ~4 characters per token."""
+    global _encoding
+    if tiktoken is None:
+        return math.ceil(len(text) / 4)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text))
+
+
+def answer_intent(findings):
+    """The intent the final answer is written for; "unknown" when the graph had nothing to go on."""
+    intent = findings.get("intent")
+    if intent == "faq" and not findings.get("faq_answer"):
+        return "unknown"
+    return intent if intent in MAX_TOKENS else "unknown"
+
+
+def max_tokens_for(findings):
+    """Output token limit for the final answer to these findings."""
+    return MAX_TOKENS[answer_intent(findings)]
+
+
+def _context_fields(findings):
+    """Ordered ``(name, values)`` context fields, de-duplicated, empty ones left out."""
+    phases = [phase.replace("_phase", "") for phase in findings.get("phases", [])]
+    campaign = findings.get("campaign")
+    fields = [
+        ("indicators", findings.get("indicators", [])),
+        ("techniques", findings.get("techniques", [])),
+        ("phases", phases),
+        ("severity", [findings["severity"]] if findings.get("severity") else []),
+        ("assets", findings.get("assets", [])),
+        ("actions", findings.get("response_actions", [])),
+        ("answer", [findings["faq_answer"]] if findings.get("faq_answer") else []),
+    ]
+    if campaign and campaign["events"] > 1:
+        fields.append(("campaign", [
+            f"{campaign['events']} reports",
+            "now " + (campaign["phase"] or "").replace("_phase", ""),
+        ] + (["via " + ",".join(campaign["linked"])] if campaign.get("linked") else [])))
+    return [(name, list(dict.fromkeys(values))) for name, values in fields if values]
+
+
+def _render(query, fields):
+    lines = [f"q: {query}"]
+    for name, values in fields:
+        lines.append(f"{name}: {'; '.join(values) if name in ('actions', 'answer', 'campaign') else ','.join(values)}")
+    return "\n".join(lines)
+
+
+def _shorten(query):
+    return query[: len(query) * 3 // 4] + "…"
+
+
+def build_context(query, findings, budget=CONTEXT_BUDGET):
+    """Findings as compact ``name: values`` lines, cut to at most ``budget`` tokens.
+
+    Over budget, long lists are shortened to their first few items, then a
+    long query is truncated to half the budget so the findings keep the
+    rest, then fields are dropped least important first, and finally the
+    query is truncated further.
+    """
+    fields = _context_fields(findings)
+    context = _render(query, fields)
+    if count_tokens(context) <= budget:
+        return context
+    fields = [
+        (name, values[:_MAX_ITEMS] + [f"+{len(values) - _MAX_ITEMS} more"] if len(values) > _MAX_ITEMS else values)
+        for name, values in fields
+    ]
+    context = _render(query, fields)
+    while count_tokens(context) > budget and count_tokens(query) > budget // 2 and len(query) > 40:
+        query = _shorten(query)
+        context = _render(query, fields)
+    for name in _TRIM_ORDER:
+        if count_tokens(context) <= budget:
+            return context
+        fields = [field for field in fields if field[0] != name]
+        context = _render(query, fields)
+    while count_tokens(context) > budget and len(query) > 40:
+        query = _shorten(query)
+        context = _render(query, fields)
+    return context
+
+
+def final_prompt(query, findings, budget=CONTEXT_BUDGET, json_output=True):
+    """Final-answer prompt: budgeted context, an intent-specific instruction and (by default) a JSON reply format.
+
+    Streaming callers pass ``json_output=False`` to get a plain-text answer
+    they can forward as it arrives.
+    """
+    parts = [build_context(query, findings, budget), _INSTRUCTIONS[answer_intent(findings)]]
+    if json_output:
+        parts.append(_JSON_FORMAT)
+    return "\n".join(parts)
+
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+# The "answer" string of a JSON reply cut off by max_tokens
+_PARTIAL_ANSWER = re.compile(r'"answer"\s*:\s*"((?:[^"\\]|\\.)*)')
+_LEGACY = re.compile(r"selected question:\s*(?P<question>.*?)\s*humanized answer:\s*(?P<answer>.*)", re.I | re.S)
+
+
+def parse_answer(response, query):
+    """Parse a final completion into ``selected_question`` and ``humanized_answer``.
+
+    Accepts the requested JSON (also inside a code fence, surrounded by
+    text, or cut off mid-answer), the older "Selected Question: / Humanized
+    Answer:" layout, and otherwise treats the whole completion as the answer.
+    """
+    text = _FENCE.sub("", (response or "").strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            answer = data.get("answer") or data.get("humanized_answer")
+            if isinstance(answer, str) and answer.strip():
+                question = data.get("question") or data.get("selected_question") or query
+                return {"selected_question": str(question).strip(), "humanized_answer": answer.strip()}
+    partial = _PARTIAL_ANSWER.search(text)
+    if partial:
+        try:
+            answer = json.loads(f'"{partial.group(1).rstrip(chr(92))}"')
+        except json.JSONDecodeError:
+            answer = partial.group(1)
+        return {"selected_question": query, "humanized_answer": answer.strip()}
+    match = _LEGACY.search(text)
+    if match:
+        return {
+            "selected_question": match.group("question") or query,
+            "humanized_answer": match.group("answer").strip(),
+        }
+    return {"selected_question": query, "humanized_answer": text}
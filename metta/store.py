@@ -0,0 +1,117 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from hyperon import MeTTa, E, S, ValueAtom
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learned (
+    id INTEGER PRIMARY KEY,
+    relation TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    value TEXT NOT NULL,
+    is_value INTEGER NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (relation, subject, value)
+)
+"""
+
+
+class KnowledgeStore:
+    """Append-only SQLite (WAL) journal of knowledge learned at runtime.
+
+    ``append`` only enqueues; a background thread commits queued facts in
+    batches, so callers on the event loop never wait on disk I/O.
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._closed = False
+        conn = self._connect()
+        with conn:
+            conn.execute(_SCHEMA)
+        conn.close()
+        self._writer = threading.Thread(target=self._run, name="knowledge-store", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def append(self, relation, subject, value, is_value=True):
+        """Queue one learned (relation subject value) fact for persistence."""
+        if self._closed:
+            raise RuntimeError("KnowledgeStore is closed")
+        self._queue.put((relation, subject, value, int(is_value), time.time()))
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size and not stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO learned (relation, subject, value, is_value, created) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                except sqlite3.Error as e:
+                    logger.error("Error persisting learned knowledge: %s", e)
+        conn.close()
+
+    def since(self, last_id=0):
+        """Return ``(id, relation, subject, value, is_value)`` rows committed after ``last_id``, oldest first.
+
+        Other processes sharing the database use this to pick up facts
+        learned elsewhere.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, relation, subject, value, is_value FROM learned WHERE id > ? ORDER BY id",
+            (last_id,),
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def replay(self, metta: MeTTa):
+        """Add every persisted fact to the space, oldest first; returns the id of the last one (0 if none)."""
+        rows = self.since(0)
+        space = metta.space()
+        for _, relation, subject, value, is_value in rows:
+            space.add_atom(E(S(relation), S(subject), ValueAtom(value) if is_value else S(value)))
+        return rows[-1][0] if rows else 0
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
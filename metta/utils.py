@@ -1,25 +1,179 @@
+import asyncio
 import json
-from openai import OpenAI
+import logging
+import random
+import time
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 from .incidentrag import IncidentRAG
+from .metrics import metrics
+from .plans import attack_pattern, max_severity, merge_entries
+from .prompts import CONTEXT_BUDGET, final_prompt, max_tokens_for, parse_answer
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError, asyncio.TimeoutError)
 
 class LLM:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         self.client = OpenAI(
             api_key=api_key,
             base_url="https://api.asi1.ai/v1"
         )
+        self.model = "asi1-mini"  # ASI:One model name
+        self.cache = cache
 
-    def create_completion(self, prompt, max_tokens=300):
+    def create_completion(self, prompt, max_tokens=300, similar=False):
+        if self.cache is not None:
+            cached = self.cache.get(prompt, self.model, max_tokens, similar)
+            if cached is not None:
+                return cached
         completion = self.client.chat.completions.create(
             messages=[{"role": "user", "content": prompt}],
-            model="asi1-mini",  # ASI:One model name
+            model=self.model,
             max_tokens=max_tokens
         )
-        return completion.choices[0].message.content
+        content = completion.choices[0].message.content
+        if self.cache is not None and content:
+            self.cache.put(prompt, self.model, max_tokens, content)
+        return content
+
+class AsyncLLM:
+    """Non-blocking ASI:One client sharing one connection pool across calls.
+
+    At most ``max_in_flight`` completions run at once; each attempt is bounded
+    by ``timeout`` seconds and transient failures are retried with full-jitter
+    exponential backoff.
+    """
+
+    def __init__(self, api_key, cache=None, max_in_flight=8, timeout=30.0, max_retries=3,
+                 backoff=0.5, base_url="https://api.asi1.ai/v1"):
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+                timeout=timeout,
+            ),
+        )
+        self.model = "asi1-mini"  # ASI:One model name
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._in_flight = {}
+
+    async def create_completion(self, prompt, max_tokens=300, key=None, similar=False):
+        """Return a completion, sharing one call among concurrent requests with the same key.
+
+        ``key`` defaults to ``(prompt, max_tokens)``; callers pass their own
+        to coalesce requests whose prompts differ but ask the same thing.
+        ``similar`` allows the cache to answer from a near-identical prompt.
+        """
+        flight_key = key if key is not None else (prompt, max_tokens)
+        flight = self._in_flight.get(flight_key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._complete(prompt, max_tokens, similar))
+            self._in_flight[flight_key] = flight
+            flight.add_done_callback(lambda _: self._in_flight.pop(flight_key, None))
+        return await asyncio.shield(flight)
+
+    async def _complete(self, prompt, max_tokens, similar):
+        if self.cache is not None:
+            cached = self.cache.get(prompt, self.model, max_tokens, similar)
+            if cached is not None:
+                return cached
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    completion = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            messages=[{"role": "user", "content": prompt}],
+                            model=self.model,
+                            max_tokens=max_tokens
+                        ),
+                        self.timeout,
+                    )
+                break
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        content = completion.choices[0].message.content
+        if self.cache is not None and content:
+            self.cache.put(prompt, self.model, max_tokens, content)
+        return content
+
+    async def stream_completion(self, prompt, max_tokens=300, similar=False):
+        """Yield completion text deltas as they arrive; cached answers are yielded whole.
+
+        The upstream stream is drained into a queue by a separate task, so
+        its ``max_in_flight`` slot is freed as soon as the model finishes,
+        however slowly the caller consumes the deltas.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(prompt, self.model, max_tokens, similar)
+            if cached is not None:
+                yield cached
+                return
+        queue = asyncio.Queue()
+        producer = asyncio.ensure_future(self._drain_stream(prompt, max_tokens, queue))
+        parts = []
+        try:
+            while (delta := await queue.get()) is not None:
+                parts.append(delta)
+                yield delta
+            await producer
+        finally:
+            producer.cancel()
+        if self.cache is not None and parts:
+            self.cache.put(prompt, self.model, max_tokens, "".join(parts))
+
+    async def _drain_stream(self, prompt, max_tokens, queue):
+        """Put each delta of a streamed completion on ``queue``, then None."""
+        sent = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._semaphore:
+                        stream = await asyncio.wait_for(
+                            self.client.chat.completions.create(
+                                messages=[{"role": "user", "content": prompt}],
+                                model=self.model,
+                                max_tokens=max_tokens,
+                                stream=True
+                            ),
+                            self.timeout,
+                        )
+                        async for chunk in stream:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                sent = True
+                                queue.put_nowait(delta)
+                    return
+                except RETRYABLE_ERRORS:
+                    # Only retry if nothing has been sent downstream yet
+                    if attempt == self.max_retries or sent:
+                        raise
+                    await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        finally:
+            queue.put_nowait(None)
 
-def get_intent_and_indicators(query, llm):
-    """Use LLM to classify intent and extract indicators."""
-    prompt = (
+    async def close(self):
+        await self.client.close()
+
+def _intent_prompt(query):
+    return (
         f"Given the cybersecurity query: '{query}'\n"
         "Classify the intent as one of: 'indicator', 'response', 'faq', or 'unknown'.\n"
         "Extract the most relevant cybersecurity indicators (e.g., powershell, smb_traffic, file_encryption, scheduled_task, rdp_connection, lsass_access).\n"
@@ -29,16 +183,16 @@ def get_intent_and_indicators(query, llm):
         "  \"indicators\": [\"<indicator1>\", \"<indicator2>\"]\n"
         "}"
     )
-    response = llm.create_completion(prompt)
+
+def _parse_intent(response):
     try:
         result = json.loads(response)
         return result["intent"], result.get("indicators", [])
     except json.JSONDecodeError:
-        print(f"Error parsing LLM response: {response}")
+        logger.warning("Error parsing LLM response: %s", response)
         return "unknown", []
 
-def generate_knowledge_response(query, intent, indicators, llm):
-    """Use LLM to generate a response for new knowledge based on intent."""
+def _knowledge_prompt(query, intent, indicators):
     if intent == "indicator" and indicators:
         prompt = (
             f"Query: '{query}'\n"
@@ -60,103 +214,265 @@ def generate_knowledge_response(query, intent, indicators, llm):
         )
     else:
         return None
-    return llm.create_completion(prompt)
+    return prompt
+
+def summarize_indicators(resolved, rag: IncidentRAG, assets=()):
+    """Combine ``resolve_indicators`` output into techniques, phases, severity and response actions.
+
+    Severity is the highest of the techniques' severities and the base
+    severities of any ``assets`` types involved.
+    """
+    merged = merge_entries(resolved.values())
+    asset_severities = [sev for asset in assets for sev in rag.get_asset_severity(asset)]
+    return {
+        "techniques": merged["techniques"],
+        "tactics": merged["tactics"],
+        "phases": merged["phases"],
+        "severity": max_severity(merged["severities"] + asset_severities),
+        "response_actions": rag.get_response_actions(attack_pattern(merged["phases"])),
+    }
+
+def correlation_keys(session=None, sender=None, assets=()):
+    """Keys a report is correlated under: its session, its sender and each asset type involved."""
+    keys = [session] if session is not None else []
+    if sender is not None:
+        keys.append(f"sender:{sender}")
+    keys.extend(f"asset:{asset}" for asset in assets)
+    return keys
+
+def correlate(findings, correlator, session=None, sender=None):
+    """Record indicator findings with ``correlator`` and add the merged campaign state to them."""
+    keys = correlation_keys(session, sender, findings.get("assets", ()))
+    if keys:
+        findings["campaign"] = correlator.observe_all(
+            keys, findings["techniques"], findings["tactics"], findings["phases"]
+        )
+    return findings
 
-def process_query(query, rag: IncidentRAG, llm: LLM):
-    """Process incident query using RAG and LLM (matching medical agent pattern)."""
-    intent, indicators = get_intent_and_indicators(query, llm)
-    print(f"Intent: {intent}, Indicators: {indicators}")
-    prompt = ""
+def _context_steps(query, rag: IncidentRAG, classifier=None, correlator=None, session=None, sender=None):
+    """Classify the query and gather graph findings without doing any I/O itself.
+
+    Like every step generator here it yields lists of ``(prompt, max_tokens,
+    key, stage)`` completion requests and is sent back the list of
+    completions, so the same logic backs the blocking, async and streaming
+    entry points. Requests in one list are independent and may run
+    concurrently; ``key`` (or the prompt itself when None) lets concurrent
+    identical requests share one call, and ``stage`` names the latency metric.
+    Returns the findings dict the final prompt is built from. With a
+    ``correlator``, indicator findings are also recorded under the session,
+    sender and asset keys and the merged campaign state is added to the
+    findings.
+    """
+    local = None
+    if classifier is not None:
+        with metrics.span("intent.local"):
+            local = classifier.classify(query)
+    if local is not None and local[2] >= classifier.threshold:
+        intent, indicators = local[0], local[1]
+    else:
+        (response,) = yield [(_intent_prompt(query), 300, None, "llm.intent")]
+        intent, indicators = _parse_intent(response)
+    logger.debug("Intent: %s, Indicators: %s", intent, indicators)
+    findings = {"intent": intent, "indicators": indicators}
 
     if intent == "faq":
-        faq_answer = rag.query_faq(query)
+        faq_question = classifier.match_faq(query) if classifier is not None else None
+        faq_answer = rag.query_faq(faq_question or query)
         if not faq_answer:
-            new_answer = generate_knowledge_response(query, intent, indicators, llm)
-            if new_answer:
+            knowledge_prompt = _knowledge_prompt(query, intent, indicators)
+            new_answer = None
+            if knowledge_prompt:
+                (new_answer,) = yield [(knowledge_prompt, 300, ("faq", query), "llm.knowledge")]
+            if new_answer and not rag.query_faq(query):
                 rag.add_knowledge("faq", query, new_answer)
-                print(f"Knowledge graph updated - Added FAQ: '{query}' → '{new_answer}'")
-            prompt = (
-                f"Query: '{query}'\n"
-                f"FAQ Answer: '{new_answer or 'General assistance'}'\n"
-                "Humanize this for a security analyst with a professional tone."
-            )
+                if classifier is not None:
+                    classifier.add_faq(query)
+                logger.info("Knowledge graph updated - Added FAQ: '%s' → '%s'", query, new_answer)
+            findings["faq_answer"] = new_answer
         else:
-            prompt = (
-                f"Query: '{query}'\n"
-                f"FAQ Answer: '{faq_answer}'\n"
-                "Humanize this for a security analyst with a professional tone."
-            )
+            findings["faq_answer"] = faq_answer
     
     elif intent == "indicator" and indicators:
-        all_techniques = []
-        all_tactics = []
-        all_phases = []
-        all_severities = []
-        
-        for indicator in indicators:
-            techniques = rag.query_indicator(indicator)
-            if not techniques:
-                # Generate new knowledge
-                new_technique = generate_knowledge_response(query, intent, [indicator], llm)
-                if new_technique:
-                    rag.add_knowledge("indicator", indicator, new_technique)
-                    print(f"Knowledge graph updated - Added indicator: '{indicator}' → '{new_technique}'")
-                    techniques = [new_technique]
-            
-            all_techniques.extend(techniques)
-            
-            for technique in techniques:
-                tactics = rag.get_tactic(technique)
-                all_tactics.extend(tactics)
-                
-                severities = rag.get_severity(technique)
-                all_severities.extend(severities)
-                
-                for tactic in tactics:
-                    phases = rag.get_attack_phase(tactic)
-                    all_phases.extend(phases)
-        
-        # Determine highest severity
-        severity_order = ["critical", "high", "medium", "low"]
-        final_severity = "unknown"
-        for sev in severity_order:
-            if sev in all_severities:
-                final_severity = sev
-                break
-        
-        # Get response actions based on phase
-        attack_pattern = all_phases[0] if all_phases else "execution"
-        attack_pattern = attack_pattern.replace("_phase", "")
-        response_actions = rag.get_response_actions(attack_pattern)
-        
-        prompt = (
-            f"Query: '{query}'\n"
-            f"Indicators Detected: {', '.join(indicators)}\n"
-            f"MITRE Techniques: {', '.join(list(set(all_techniques)))}\n"
-            f"Attack Phase: {', '.join(list(set(all_phases)))}\n"
-            f"Severity: {final_severity}\n"
-            f"Response Actions: {', '.join(response_actions) if response_actions else 'Assess and contain'}\n"
-            "Generate a professional, actionable incident response for a security analyst."
-        )
+        assets = classifier.detect_assets(query) if classifier is not None else []
+        if rag.plans is not None:
+            unmapped = rag.plans.unmapped(indicators)
+        else:
+            resolved = rag.resolve_indicators(indicators)
+            unmapped = [indicator for indicator, entry in resolved.items() if not entry["techniques"]]
+        # Generate new knowledge for all unmapped indicators at once
+        new_techniques = []
+        if unmapped:
+            new_techniques = yield [
+                (_knowledge_prompt(query, intent, [indicator]), 300, ("indicator", indicator), "llm.knowledge")
+                for indicator in unmapped
+            ]
+        for indicator, new_technique in zip(unmapped, new_techniques):
+            # A concurrent query may already have learned this indicator
+            if new_technique and not rag.query_indicator(indicator):
+                rag.add_knowledge("indicator", indicator, new_technique)
+                if classifier is not None:
+                    classifier.add_indicator(indicator)
+                logger.info("Knowledge graph updated - Added indicator: '%s' → '%s'", indicator, new_technique)
+        if rag.plans is not None:
+            # add_knowledge has already refreshed the affected plan entries
+            findings.update(rag.plans.plan(indicators, assets))
+        else:
+            if unmapped:
+                resolved.update(rag.resolve_indicators(unmapped))
+            findings.update(summarize_indicators(resolved, rag, assets))
+        if assets:
+            findings["assets"] = assets
+        if correlator is not None:
+            correlate(findings, correlator, session, sender)
     
     elif intent == "response":
-        response_actions = generate_knowledge_response(query, intent, indicators, llm)
-        prompt = (
-            f"Query: '{query}'\n"
-            f"Response Actions: {response_actions}\n"
-            "Provide clear, actionable incident response guidance."
-        )
-    
-    if not prompt:
-        prompt = f"Query: '{query}'\nNo specific match found. Provide general cybersecurity incident response guidance."
+        (response_actions,) = yield [(_knowledge_prompt(query, intent, indicators), 300, None, "llm.knowledge")]
+        findings["response_actions"] = [response_actions] if response_actions else []
+    return findings
+
+def _query_steps(query, rag: IncidentRAG, classifier=None, correlator=None, session=None, budget=CONTEXT_BUDGET,
+                 sender=None):
+    """Step generator for a full query; returns the final response dict."""
+    findings = yield from _context_steps(query, rag, classifier, correlator, session, sender)
+    return (yield from _answer_steps(query, findings, budget))
+
+def _answer_steps(query, findings, budget=CONTEXT_BUDGET):
+    """Step generator for the final answer to already gathered findings."""
+    (response,) = yield [(final_prompt(query, findings, budget), max_tokens_for(findings), None, "llm.final")]
+    return parse_answer(response, query)
+
+# Stages whose answers may come from a similar cached prompt; the rest
+# (intent, knowledge) feed the graph and must match exactly
+_SIMILAR_STAGES = frozenset({"llm.final"})
+
+def _run_steps(steps, llm: LLM):
+    def complete(prompt, max_tokens, stage):
+        with metrics.span(stage):
+            return llm.create_completion(prompt, max_tokens=max_tokens, similar=stage in _SIMILAR_STAGES)
 
-    prompt += "\nFormat response as: 'Selected Question: <question>' on first line, 'Humanized Answer: <response>' on second."
-    response = llm.create_completion(prompt, max_tokens=400)
-    
     try:
-        lines = response.split('\n')
-        selected_q = lines[0].replace("Selected Question: ", "").strip()
-        answer = '\n'.join(lines[1:]).replace("Humanized Answer: ", "").strip()
-        return {"selected_question": selected_q, "humanized_answer": answer}
-    except IndexError:
-        return {"selected_question": query, "humanized_answer": response}
+        requests = next(steps)
+        while True:
+            requests = steps.send([
+                complete(prompt, max_tokens, stage)
+                for prompt, max_tokens, _, stage in requests
+            ])
+    except StopIteration as done:
+        return done.value
+
+async def _acomplete_all(requests, llm: AsyncLLM):
+    """Run one step's completion requests concurrently, returning completions in order."""
+    async def complete(prompt, max_tokens, key, stage):
+        with metrics.span(stage):
+            return await llm.create_completion(
+                prompt, max_tokens=max_tokens, key=key, similar=stage in _SIMILAR_STAGES
+            )
+
+    return list(await asyncio.gather(*(
+        complete(prompt, max_tokens, key, stage)
+        for prompt, max_tokens, key, stage in requests
+    )))
+
+async def _arun_steps(steps, llm: AsyncLLM):
+    try:
+        requests = next(steps)
+        while True:
+            requests = steps.send(await _acomplete_all(requests, llm))
+    except StopIteration as done:
+        return done.value
+
+def format_findings(findings):
+    """Render graph findings as a short markdown summary, or '' when there is nothing to show."""
+    lines = []
+    if findings.get("indicators"):
+        lines.append(f"- Indicators: {', '.join(findings['indicators'])}")
+    if findings.get("techniques"):
+        lines.append(f"- MITRE Techniques: {', '.join(findings['techniques'])}")
+    if findings.get("phases"):
+        lines.append(f"- Attack Phase: {', '.join(findings['phases'])}")
+    if findings.get("assets"):
+        lines.append(f"- Assets: {', '.join(findings['assets'])}")
+    if findings.get("severity"):
+        lines.append(f"- Severity: {findings['severity']}")
+    if findings.get("response_actions"):
+        lines.append(f"- Response Actions: {'; '.join(findings['response_actions'])}")
+    campaign = findings.get("campaign")
+    if campaign and campaign["events"] > 1:
+        lines.append(
+            f"- Campaign Phase: {campaign['phase']} "
+            f"({campaign['events']} related reports; phases seen: {', '.join(campaign['phases'])})"
+        )
+        if campaign.get("linked"):
+            lines.append(f"- Linked By: {', '.join(campaign['linked'])}")
+    if findings.get("faq_answer"):
+        lines.append(f"- Answer: {findings['faq_answer']}")
+    return "**Incident findings**\n" + "\n".join(lines) if lines else ""
+
+def local_findings(query, rag: IncidentRAG, classifier):
+    """Graph-only findings from the local classifier, without any LLM call or learning.
+
+    Cheap enough to pre-score every incoming query, and the whole answer
+    when the LLM is being shed under load.
+    """
+    with metrics.span("local_findings"):
+        intent, indicators, _ = classifier.classify(query)
+        findings = {"intent": intent, "indicators": indicators}
+        if intent == "faq":
+            faq_answer = rag.query_faq(classifier.match_faq(query) or query)
+            if faq_answer:
+                findings["faq_answer"] = faq_answer
+        elif intent == "indicator":
+            assets = classifier.detect_assets(query)
+            if rag.plans is not None:
+                findings.update(rag.plans.plan(indicators, assets))
+            else:
+                findings.update(summarize_indicators(rag.resolve_indicators(indicators), rag, assets))
+            if assets:
+                findings["assets"] = assets
+        return findings
+
+def process_query(query, rag: IncidentRAG, llm: LLM, classifier=None, correlator=None, session=None,
+                  budget=CONTEXT_BUDGET, sender=None):
+    """Process incident query using RAG and LLM (matching medical agent pattern).
+
+    ``budget`` caps the tokens of graph context in the final prompt.
+    """
+    with metrics.span("query"):
+        return _run_steps(_query_steps(query, rag, classifier, correlator, session, budget, sender), llm)
+
+async def aprocess_query(query, rag: IncidentRAG, llm: AsyncLLM, classifier=None, correlator=None, session=None,
+                         budget=CONTEXT_BUDGET, sender=None):
+    """Async variant of ``process_query``; independent completions run concurrently on ``AsyncLLM``."""
+    with metrics.span("query"):
+        return await _arun_steps(_query_steps(query, rag, classifier, correlator, session, budget, sender), llm)
+
+async def astream_query(query, rag: IncidentRAG, llm: AsyncLLM, classifier=None, chunk_chars=200,
+                        correlator=None, session=None, budget=CONTEXT_BUDGET, sender=None):
+    """Stream a query's answer as ``(kind, text)`` events.
+
+    Emits one ``("findings", text)`` event with the graph findings as soon as
+    they are known, then ``("chunk", text)`` events of roughly ``chunk_chars``
+    characters as the final narrative streams in.
+    """
+    with metrics.span("stream.findings"):
+        findings = await _arun_steps(_context_steps(query, rag, classifier, correlator, session, sender), llm)
+    async for event in _astream_answer(query, findings, llm, chunk_chars, budget):
+        yield event
+
+async def _astream_answer(query, findings, llm: AsyncLLM, chunk_chars, budget):
+    """The findings event followed by the streamed final narrative, for ``astream_query``."""
+    # Plain-text answer, so chunks can be forwarded as they arrive
+    prompt = final_prompt(query, findings, budget, json_output=False)
+    summary = format_findings(findings)
+    if summary:
+        yield "findings", summary
+    buffer = ""
+    start = time.perf_counter()
+    async for delta in llm.stream_completion(prompt, max_tokens=max_tokens_for(findings), similar=True):
+        buffer += delta
+        if len(buffer) >= chunk_chars:
+            yield "chunk", buffer
+            buffer = ""
+    if buffer:
+        yield "chunk", buffer
+    metrics.observe("llm.final_stream", time.perf_counter() - start)
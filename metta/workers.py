@@ -0,0 +1,232 @@
+"""Multi-process query handling.
+
+MeTTa matching is CPU-bound and a ``MeTTa`` space cannot be shared between
+processes, so ``WorkerPool`` runs N worker processes that each hold their own
+copy of the graph, built from the same on-disk sources (the ATT&CK snapshot
+and the learned-knowledge store). The pipeline's step generators run inside
+the workers while every LLM call is made by the parent's ``AsyncLLM``, so
+the completion cache, single-flight coalescing and connection pool stay
+shared and workers never block on the network.
+
+Messages are routed to a worker by session. Correlation state stays in the
+parent, so reports sharing a sender or asset are linked whichever workers
+analyzed them; the final answer is also built there. Facts learned by one worker are
+committed to the shared ``KnowledgeStore`` and picked up by the others
+before their next query. Stage timings recorded in a worker travel back
+with each call's result and are merged into the parent's ``metrics``, and a
+worker whose process dies is replaced by a fresh one.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from hyperon import MeTTa
+
+from .attack import load_attack_bundle
+from .classifier import LocalClassifier
+from .correlation import CorrelationEngine
+from .incidentrag import IncidentRAG
+from .index import match_space
+from .knowledge import initialize_knowledge_graph
+from .metrics import metrics
+from .prompts import CONTEXT_BUDGET
+from .store import KnowledgeStore
+from .utils import (
+    AsyncLLM, _acomplete_all, _answer_steps, _arun_steps, _astream_answer, _context_steps, correlate, local_findings,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-process state, set up by ``_init_worker``
+_worker = {}
+
+
+def _init_worker(config):
+    # Forked workers inherit the parent's histograms; only ship their own
+    metrics.reset()
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    if config.get("attack_bundle"):
+        load_attack_bundle(metta, config["attack_bundle"], config.get("snapshot_dir", ".cache"))
+    store = KnowledgeStore(config["store_path"])
+    last_id = store.replay(metta)
+    rag = IncidentRAG(
+        metta,
+        use_index=config.get("use_index", True),
+        store=store,
+        materialize=config.get("materialize", True),
+    )
+    _worker.update(
+        rag=rag,
+        store=store,
+        last_id=last_id,
+        classifier=LocalClassifier(rag, threshold=config.get("classifier_threshold", 0.75)),
+        steps={},
+    )
+    logger.info("Worker %d ready", os.getpid())
+
+
+def _sync_learned():
+    """Apply facts other workers have committed since the last sync."""
+    rag, classifier = _worker["rag"], _worker["classifier"]
+    for row_id, relation, subject, value, _ in _worker["store"].since(_worker["last_id"]):
+        _worker["last_id"] = row_id
+        # Includes this worker's own facts, which it already holds
+        if rag.index is not None:
+            known = rag.index.lookup(relation, subject)
+        else:
+            known = match_space(rag.metta, relation, subject)
+        if value in known:
+            continue
+        rag.add_knowledge(relation, subject, value, persist=False)
+        if relation == "indicator":
+            classifier.add_indicator(subject)
+        elif relation == "faq":
+            classifier.add_faq(subject)
+
+
+def _advance(request_id, steps, completions):
+    try:
+        requests = next(steps) if completions is None else steps.send(completions)
+    except StopIteration as done:
+        _worker["steps"].pop(request_id, None)
+        return True, done.value
+    except BaseException:
+        _worker["steps"].pop(request_id, None)
+        raise
+    return False, requests
+
+
+def _start(request_id, query):
+    _sync_learned()
+    steps = _context_steps(query, _worker["rag"], _worker["classifier"])
+    _worker["steps"][request_id] = steps
+    return _advance(request_id, steps, None), metrics.drain()
+
+
+def _send(request_id, completions):
+    return _advance(request_id, _worker["steps"][request_id], completions), metrics.drain()
+
+
+def _discard(request_id):
+    steps = _worker["steps"].pop(request_id, None)
+    if steps is not None:
+        steps.close()
+
+
+def _local(query):
+    _sync_learned()
+    return local_findings(query, _worker["rag"], _worker["classifier"]), metrics.drain()
+
+
+def _close_worker():
+    _worker["store"].close()
+
+
+def _ready():
+    return os.getpid()
+
+
+class WorkerPool:
+    """Session-affine pool of worker processes serving queries against one shared LLM client.
+
+    ``config`` holds the worker settings: ``store_path`` (required, the
+    shared learned-knowledge database), ``attack_bundle``, ``snapshot_dir``,
+    ``use_index``, ``materialize``, ``classifier_threshold`` and
+    ``correlation_window``.
+    """
+
+    def __init__(self, workers, config):
+        self.config = config
+        self.correlator = CorrelationEngine(window=config.get("correlation_window", 1800.0))
+        self._shards = [self._new_shard() for _ in range(workers)]
+        self._ids = itertools.count()
+
+    def _new_shard(self, mp_context=None):
+        return ProcessPoolExecutor(
+            max_workers=1, mp_context=mp_context, initializer=_init_worker, initargs=(self.config,)
+        )
+
+    def start(self):
+        """Start every worker; returns futures that resolve to the worker pids once their graphs are loaded.
+
+        Call this before the event loop and other threads start, since
+        workers are forked from the calling process.
+        """
+        return [shard.submit(_ready) for shard in self._shards]
+
+    def _shard(self, session):
+        index = zlib.crc32(str(session).encode()) % len(self._shards)
+        return index, self._shards[index]
+
+    async def _call(self, index, shard, func, *args):
+        """Run ``func`` in a worker, merge the timings it recorded and return its result.
+
+        If the worker process has died the shard is replaced, so only the
+        calls already in flight on it fail.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            result, worker_metrics = await loop.run_in_executor(shard, func, *args)
+        except BrokenProcessPool:
+            if self._shards[index] is shard:
+                logger.warning("Worker %d died; starting a replacement", index)
+                shard.shutdown(wait=False)
+                # Forking from the running, threaded parent is unsafe
+                self._shards[index] = self._new_shard(multiprocessing.get_context("forkserver"))
+            raise
+        metrics.merge(worker_metrics)
+        return result
+
+    async def _findings(self, query, session, sender, llm: AsyncLLM):
+        """Graph findings from the session's worker, correlated here in the parent."""
+        # The request's steps live in this shard, so it stays pinned to it
+        # even if the session's slot gets a replacement meanwhile.
+        index, shard = self._shard(session)
+        request_id = next(self._ids)
+        done, value = await self._call(index, shard, _start, request_id, query)
+        try:
+            while not done:
+                completions = await _acomplete_all(value, llm)
+                done, value = await self._call(index, shard, _send, request_id, completions)
+        except BaseException:
+            if not done:
+                try:
+                    shard.submit(_discard, request_id)
+                except (BrokenProcessPool, RuntimeError):
+                    pass  # the worker and its steps are gone
+            raise
+        if value.get("intent") == "indicator" and value.get("indicators"):
+            correlate(value, self.correlator, session, sender)
+        return value
+
+    async def aprocess_query(self, query, llm: AsyncLLM, session=None, budget=CONTEXT_BUDGET, sender=None):
+        """``aprocess_query`` with the graph work done in the session's worker."""
+        with metrics.span("query"):
+            findings = await self._findings(query, session, sender, llm)
+            return await _arun_steps(_answer_steps(query, findings, budget), llm)
+
+    async def local_findings(self, query, session=None):
+        """``local_findings`` computed in the session's worker."""
+        return await self._call(*self._shard(session), _local, query)
+
+    async def astream_query(self, query, llm: AsyncLLM, session=None, chunk_chars=200, budget=CONTEXT_BUDGET,
+                            sender=None):
+        """``astream_query`` with the graph work done in the session's worker."""
+        with metrics.span("stream.findings"):
+            findings = await self._findings(query, session, sender, llm)
+        async for event in _astream_answer(query, findings, llm, chunk_chars, budget):
+            yield event
+
+    def close(self):
+        for shard in self._shards:
+            try:
+                shard.submit(_close_worker)
+            except BrokenProcessPool:
+                pass
+            shard.shutdown(wait=True)
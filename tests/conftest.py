@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make ``metta`` and the test helpers importable however pytest is invoked
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
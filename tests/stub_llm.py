@@ -0,0 +1,76 @@
+"""Minimal OpenAI-compatible chat completions server for exercising ``AsyncLLM`` offline."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """Answers ``POST /v1/chat/completions`` with ``reply``, streamed as SSE when asked.
+
+    ``fail_first`` requests get a 503, every response waits ``delay``
+    seconds, and ``requests`` counts the calls received.
+    """
+
+    def __init__(self, reply="ok", fail_first=0, delay=0.0):
+        self.reply = reply
+        self.fail_first = fail_first
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                time.sleep(stub.delay)
+                if failing:
+                    self._send(503, "application/json", b'{"error": {"message": "unavailable"}}')
+                    return
+                if request.get("stream"):
+                    events = [
+                        {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": request["model"],
+                         "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                        for word in stub.reply.split(" ")
+                    ]
+                    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                    self._send(200, "text/event-stream", body.encode())
+                    return
+                completion = {
+                    "id": "c", "object": "chat.completion", "created": 0, "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": stub.reply}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }
+                self._send(200, "application/json", json.dumps(completion).encode())
+
+        return Handler
@@ -0,0 +1,110 @@
+import asyncio
+
+from metta.admission import FAQ_PRIORITY, RESPONSE_PRIORITY, AdmissionController, RateLimiter, priority_of
+
+
+def test_priority_of():
+    assert priority_of({"intent": "indicator", "severity": "critical"}) == 0
+    assert priority_of({"intent": "indicator", "severity": "low"}) == 3
+    assert priority_of({"intent": "response"}) == RESPONSE_PRIORITY
+    assert priority_of({"intent": "faq"}) == FAQ_PRIORITY
+
+
+def test_token_bucket_burst_refill_and_retry_after():
+    limiter = RateLimiter(rate=2.0, burst=2)
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("a", now=0.0) == 0.5
+    assert limiter.acquire("a", now=0.25) == 0.25
+    assert limiter.acquire("a", now=0.5) == 0
+    # Refill is capped at the burst size
+    assert [limiter.acquire("a", now=100.0) for _ in range(3)] == [0, 0, 0.5]
+    assert limiter.acquire("b", now=0.0) == 0
+
+
+def test_least_recently_seen_sender_is_dropped():
+    limiter = RateLimiter(rate=1.0, burst=1, max_senders=2)
+    limiter.acquire("a", now=0.0)
+    limiter.acquire("b", now=0.0)
+    limiter.acquire("c", now=0.0)
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("c", now=0.0) == 1.0
+
+
+def test_throttle_counts_limited_requests():
+    admission = AdmissionController(rate_limiter=RateLimiter(rate=1.0, burst=1))
+    assert admission.throttle("a") == 0
+    assert admission.throttle("a") > 0
+    assert admission.stats["limited"] == 1
+
+
+def test_admit_thresholds():
+    async def scenario():
+        admission = AdmissionController(concurrency=2, max_queue=4, degrade_depth=2)
+
+        async def job():
+            pass
+
+        decisions = []
+        for depth in range(5):
+            decisions.append((depth, admission.admit(1), admission.admit(0)))
+            admission.submit(1, job)
+        admission.close()
+        return decisions, admission.stats
+
+    decisions, stats = asyncio.run(scenario())
+    assert decisions == [
+        (0, ("queued", 0.0), ("queued", 0.0)),
+        (1, ("queued", 0.0), ("queued", 0.0)),
+        (2, ("degraded", 0.0), ("queued", 0.0)),
+        (3, ("degraded", 0.0), ("queued", 0.0)),
+        (4, ("rejected", 2.0), ("rejected", 2.0)),
+    ]
+    assert stats == {"queued": 5, "degraded": 2, "rejected": 2, "limited": 0}
+
+
+def test_critical_jobs_overtake_queued_faqs():
+    async def scenario():
+        admission = AdmissionController(concurrency=1)
+        gate = asyncio.Event()
+        order = []
+
+        def job(name):
+            async def run():
+                if name == "blocker":
+                    await gate.wait()
+                order.append(name)
+                return name
+            return run
+
+        futures = [admission.submit(FAQ_PRIORITY, job("blocker"))]
+        await asyncio.sleep(0)  # the single worker picks up the blocker
+        futures += [admission.submit(FAQ_PRIORITY, job(f"faq{i}")) for i in range(2)]
+        futures += [admission.submit(RESPONSE_PRIORITY, job("response"))]
+        futures += [admission.submit(0, job("critical"))]
+        gate.set()
+        results = await asyncio.gather(*futures)
+        admission.close()
+        return order, results
+
+    order, results = asyncio.run(scenario())
+    assert order == ["blocker", "critical", "response", "faq0", "faq1"]
+    assert results == ["blocker", "faq0", "faq1", "response", "critical"]
+
+
+def test_failed_job_sets_its_future():
+    async def scenario():
+        admission = AdmissionController(concurrency=1)
+
+        async def job():
+            raise ValueError("boom")
+
+        future = admission.submit(0, job)
+        try:
+            await future
+        except ValueError as e:
+            return str(e)
+        finally:
+            admission.close()
+
+    assert asyncio.run(scenario()) == "boom"
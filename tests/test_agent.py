@@ -0,0 +1,105 @@
+import asyncio
+import os
+import runpy
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from uagents_core.contrib.protocols.chat import ChatMessage, EndSessionContent, TextContent
+
+AGENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent.py")
+
+
+@pytest.fixture(autouse=True)
+def event_loop():
+    # uagents grabs the current loop when an Agent is built, and an earlier
+    # asyncio.run() in the same process leaves none behind
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def test_reimport_as_mp_main_builds_no_worker_pool(monkeypatch, tmp_path):
+    # forkserver re-runs the main script under this name in every process it starts
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("KNOWLEDGE_STORE", str(tmp_path / "learned.db"))
+    namespace = runpy.run_path(AGENT, run_name="__mp_main__")
+    assert namespace["pool"] is None
+    assert namespace["pool_ready"] == []
+
+
+class Logger:
+    def __init__(self):
+        self.errors = []
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def error(self, message, *args, **kwargs):
+        self.errors.append(message)
+
+    exception = error
+
+
+class Storage:
+    def set(self, key, value):
+        pass
+
+
+class Context:
+    def __init__(self):
+        self.session = "session"
+        self.storage = Storage()
+        self.logger = Logger()
+        self.sent = []
+
+    async def send(self, destination, message):
+        self.sent.append(message)
+
+
+def chat(text):
+    return ChatMessage(timestamp=datetime.now(timezone.utc), msg_id=uuid4(), content=[TextContent(type="text", text=text)])
+
+
+def test_failed_startup_is_reported_to_senders(monkeypatch):
+    import agent
+
+    def broken_runtime():
+        raise OSError("knowledge store unreadable")
+
+    monkeypatch.setattr(agent, "build_runtime", broken_runtime)
+    monkeypatch.setattr(agent, "runtime_ready", asyncio.Event())
+    monkeypatch.setattr(agent, "startup_done", asyncio.Event())
+    monkeypatch.setattr(agent, "startup_error", None)
+
+    async def scenario():
+        ctx = Context()
+        waiting = asyncio.ensure_future(agent.handle_message(ctx, "sender", chat("powershell on DC01")))
+        await agent.warm_up(ctx)
+        await asyncio.wait_for(waiting, 5)
+        return ctx
+
+    ctx = asyncio.run(scenario())
+    assert isinstance(agent.startup_error, OSError)
+    assert ctx.logger.errors
+    reply = ctx.sent[-1]
+    assert "failed to start" in reply.content[0].text
+    assert isinstance(reply.content[-1], EndSessionContent)
+
+
+def test_stream_failure_ends_the_session(monkeypatch):
+    import agent
+
+    async def failing_stream(ctx, sender, user_query, session):
+        await ctx.send(sender, agent.create_text_chat("**Incident findings**"))
+        raise TimeoutError("stream stalled")
+
+    monkeypatch.setattr(agent, "STREAM_RESPONSES", True)
+    monkeypatch.setattr(agent, "_answer_query", failing_stream)
+    ctx = Context()
+    asyncio.run(agent.answer_query(ctx, "sender", "powershell", "session"))
+    assert len(ctx.sent) == 2
+    assert "error" in ctx.sent[-1].content[0].text
+    assert isinstance(ctx.sent[-1].content[-1], EndSessionContent)
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from hyperon import MeTTa
+
+from metta import attack
+from metta.attack import load_attack_bundle, parse_attack_bundle
+from metta.index import match_space
+
+
+def mitre(external_id):
+    return [{"source_name": "mitre-attack", "external_id": external_id}]
+
+
+BUNDLE = {
+    "type": "bundle",
+    "objects": [
+        # Listed before its tactic so cross-references must be resolved at the end
+        {"type": "attack-pattern", "id": "attack-pattern--1", "name": "PowerShell",
+         "external_references": mitre("T1059.001"),
+         "kill_chain_phases": [{"kill_chain_name": "mitre-attack", "phase_name": "execution"}],
+         "x_mitre_data_sources": ["Command: Command Execution"]},
+        {"type": "x-mitre-tactic", "id": "x-mitre-tactic--1", "name": "Execution",
+         "x_mitre_shortname": "execution", "external_references": mitre("TA0002")},
+        {"type": "course-of-action", "id": "course-of-action--1", "name": "Execution Prevention",
+         "external_references": mitre("M1038")},
+        {"type": "relationship", "relationship_type": "mitigates",
+         "source_ref": "course-of-action--1", "target_ref": "attack-pattern--1"},
+        {"type": "attack-pattern", "id": "attack-pattern--2", "name": "Old Technique",
+         "external_references": mitre("T9999"), "revoked": True},
+        {"type": "course-of-action", "id": "course-of-action--2", "name": "Old Mitigation",
+         "external_references": mitre("M9999"), "x_mitre_deprecated": True},
+    ],
+}
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    path = tmp_path / "enterprise-attack.json"
+    path.write_text(json.dumps(BUNDLE))
+    return str(path)
+
+
+def test_parse_attack_bundle(bundle):
+    assert sorted(parse_attack_bundle(bundle)) == sorted([
+        ("tactic", "TA0002", "execution_phase", True),
+        ("tactic_name", "TA0002", "Execution", True),
+        ("technique_name", "T1059.001", "PowerShell", True),
+        ("data_source", "T1059.001", "Command: Command Execution", True),
+        ("mitigation_name", "M1038", "Execution Prevention", True),
+        ("technique", "T1059.001", "TA0002", False),
+        ("mitigation", "T1059.001", "M1038", False),
+    ])
+
+
+def test_load_adds_facts_to_the_space(bundle):
+    metta = MeTTa()
+    assert load_attack_bundle(metta, bundle) == 7
+    assert match_space(metta, "technique", "T1059.001") == ["TA0002"]
+    assert match_space(metta, "mitigation", "T1059.001") == ["M1038"]
+    assert match_space(metta, "technique_name", "T9999") == []
+
+
+def test_snapshot_is_reused(bundle, tmp_path, monkeypatch):
+    snapshot_dir = tmp_path / "snapshots"
+    first = MeTTa()
+    assert load_attack_bundle(first, bundle, str(snapshot_dir)) == 7
+    assert len(list(snapshot_dir.glob("attack-*.json"))) == 1
+
+    def fail(path):
+        raise AssertionError("bundle re-parsed despite a snapshot")
+
+    monkeypatch.setattr(attack, "parse_attack_bundle", fail)
+    second = MeTTa()
+    assert load_attack_bundle(second, bundle, str(snapshot_dir)) == 7
+    assert match_space(second, "technique", "T1059.001") == ["TA0002"]
+
+
+def test_changed_bundle_is_reparsed(bundle, tmp_path):
+    snapshot_dir = tmp_path / "snapshots"
+    load_attack_bundle(MeTTa(), bundle, str(snapshot_dir))
+
+    changed = dict(BUNDLE, objects=BUNDLE["objects"][1:])
+    with open(bundle, "w") as f:
+        json.dump(changed, f)
+    metta = MeTTa()
+    assert load_attack_bundle(metta, bundle, str(snapshot_dir)) == 3
+    assert match_space(metta, "technique", "T1059.001") == []
+    assert len(list(snapshot_dir.glob("attack-*.json"))) == 2
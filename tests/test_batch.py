@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from hyperon import MeTTa
+
+from metta.batch import BatchTriage
+from metta.classifier import LocalClassifier
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+
+
+class EchoLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def create_completion(self, prompt, max_tokens=300, key=None, similar=False):
+        self.calls += 1
+        return '{"question": "q", "answer": "narrative %d"}' % self.calls
+
+
+@pytest.fixture
+def triage():
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    rag = IncidentRAG(metta, use_index=True)
+    return BatchTriage(rag, LocalClassifier(rag), EchoLLM(), max_groups=2)
+
+
+def test_chunk_with_more_signatures_than_max_groups(triage):
+    chunk = [
+        (1, "powershell", None),
+        (2, "smb admin share", None),
+        (3, "lsass dump", None),
+        (4, "powershell again", None),
+    ]
+    rows = asyncio.run(triage.process_chunk(chunk))
+    assert [row["indicators"] for row in rows] == [
+        ["powershell"], ["smb_traffic"], ["lsass_access"], ["powershell"],
+    ]
+    assert all(row["narrative"] for row in rows)
+    assert rows[0]["narrative"] == rows[3]["narrative"]
+    assert triage.llm.calls == 3
+
+
+def test_asset_severity_is_part_of_the_group(triage):
+    chunk = [(1, "powershell spawned by winword on DC01", None), (2, "powershell spawned by winword", None)]
+    rows = asyncio.run(triage.process_chunk(chunk))
+    assert rows[0]["assets"] == ["domain_controller"]
+    assert rows[0]["severity"] == "critical"
+    assert rows[1]["assets"] == []
+    assert rows[1]["severity"] == "medium"
+    assert triage.llm.calls == 2
+
+
+class FlakyLLM(EchoLLM):
+    async def create_completion(self, prompt, max_tokens=300, key=None, similar=False):
+        if "lsass_access" in key[1][0]:
+            raise TimeoutError("upstream timed out")
+        return await super().create_completion(prompt, max_tokens, key)
+
+
+def test_failed_narrative_still_writes_the_chunk(triage):
+    triage.llm = FlakyLLM()
+    rows = asyncio.run(triage.process_chunk([(1, "powershell", None), (2, "lsass dump", None)]))
+    assert rows[0]["narrative"] == "narrative 1"
+    assert rows[1]["narrative"] is None
+    assert rows[1]["techniques"] == ["T1003.001"]
+    assert triage.stats["narratives"] == 1
+    assert triage.stats["narrative_errors"] == 1
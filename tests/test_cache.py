@@ -0,0 +1,51 @@
+from metta.cache import CompletionCache
+
+
+def test_exact_hit_ignores_whitespace_and_case():
+    cache = CompletionCache()
+    cache.put("Isolate  the\nHost", "m", 100, "done")
+    assert cache.get("isolate the host", "m", 100) == "done"
+    assert cache.get("isolate the host", "m", 200) is None
+    assert cache.stats() == {"hits": 1, "similar_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_lru_eviction():
+    cache = CompletionCache(max_entries=2)
+    cache.put("a", "m", 1, "A")
+    cache.put("b", "m", 1, "B")
+    cache.get("a", "m", 1)
+    cache.put("c", "m", 1, "C")
+    assert cache.get("b", "m", 1) is None
+    assert cache.get("a", "m", 1) == "A"
+
+
+def test_ttl_expiry():
+    cache = CompletionCache(ttl=-1)
+    cache.put("a", "m", 1, "A")
+    assert cache.get("a", "m", 1) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_similar_prompt_hit():
+    cache = CompletionCache(similarity=0.8)
+    cache.put("how do i respond to powershell on the domain controller", "m", 1, "A")
+    assert cache.get("how do i respond to powershell on the domain controllers", "m", 1, similar=True) == "A"
+    assert cache.get("what is lateral movement", "m", 1, similar=True) is None
+    assert cache.similar_hits == 1
+
+
+def test_similarity_is_opt_in_per_lookup():
+    cache = CompletionCache(similarity=0.8)
+    cache.put("Suggest MITRE ATT&CK techniques for the indicator dns_tunneling", "m", 1, "T1071.004")
+    assert cache.get("Suggest MITRE ATT&CK techniques for the indicator dns_beaconing", "m", 1) is None
+    assert cache.similar_hits == 0
+
+
+def test_sqlite_persistence(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = CompletionCache(path=path)
+    cache.put("a", "m", 1, "A")
+    cache.close()
+    reopened = CompletionCache(path=path)
+    assert reopened.get("a", "m", 1) == "A"
+    reopened.close()
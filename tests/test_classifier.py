@@ -0,0 +1,58 @@
+import pytest
+from hyperon import MeTTa
+
+from metta.classifier import KeywordAutomaton, LocalClassifier
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+
+
+def test_automaton_finds_in_order_of_first_occurrence():
+    automaton = KeywordAutomaton({"rdp": "rdp_connection", "powershell": "powershell", "pwsh": "powershell"})
+    assert automaton.find("pwsh launched, then rdp, then powershell again") == ["powershell", "rdp_connection"]
+
+
+def test_automaton_requires_word_start():
+    automaton = KeywordAutomaton({"rdp": "rdp_connection"})
+    assert automaton.find("wordpress upload") == []
+    assert automaton.find("inbound rdp") == ["rdp_connection"]
+
+
+def test_automaton_overlapping_patterns():
+    automaton = KeywordAutomaton({"he": "a", "she": "b", "hers": "c"})
+    assert automaton.find("ushers") == []
+    assert automaton.find("she hers") == ["b", "a", "c"]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    return LocalClassifier(IncidentRAG(metta))
+
+
+def test_classify_known_indicators(classifier):
+    intent, indicators, confidence = classifier.classify("PowerShell spawned and lsass was dumped")
+    assert intent == "indicator"
+    assert indicators == ["powershell", "lsass_access"]
+    assert confidence >= classifier.threshold
+
+
+def test_classify_unknown_indicator_lowers_confidence(classifier):
+    intent, indicators, confidence = classifier.classify("powershell with dns_tunneling and cobalt_beacon")
+    assert intent == "indicator"
+    assert indicators == ["powershell"]
+    assert confidence < classifier.threshold
+
+
+def test_classify_response_and_unknown(classifier):
+    assert classifier.classify("how do we contain this?")[0] == "response"
+    assert classifier.classify("hello there") == ("unknown", [], 0.0)
+
+
+def test_detect_assets(classifier):
+    assert classifier.detect_assets("beacon on DC01 and a laptop") == ["domain_controller", "workstation"]
+
+
+def test_remote_desktop_is_not_a_workstation(classifier):
+    assert classifier.detect_assets("remote desktop login to the file server") == ["file_server"]
+    assert classifier.classify("remote desktop login")[1] == ["rdp_connection"]
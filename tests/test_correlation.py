@@ -0,0 +1,45 @@
+from metta.correlation import CorrelationEngine
+
+
+def test_phase_advances_along_kill_chain():
+    engine = CorrelationEngine()
+    engine.observe("s", techniques=["T1059"], phases=["execution_phase"], now=0)
+    state = engine.observe("s", techniques=["T1021"], phases=["lateral_movement_phase"], now=10)
+    assert state["events"] == 2
+    assert state["phase"] == "lateral_movement_phase"
+    assert state["phases"] == ["execution_phase", "lateral_movement_phase"]
+    assert state["techniques"] == ["T1021", "T1059"]
+
+
+def test_events_expire_outside_window():
+    engine = CorrelationEngine(window=60)
+    engine.observe("s", phases=["execution_phase"], now=0)
+    engine.observe("s", phases=["impact_phase"], now=100)
+    assert engine.state("s", now=100)["phases"] == ["impact_phase"]
+    assert engine.state("s", now=1000) is None
+
+
+def test_max_events_and_max_keys():
+    engine = CorrelationEngine(max_events=2, max_keys=2)
+    for now in range(3):
+        engine.observe("a", techniques=[f"T{now}"], now=now)
+    assert engine.state("a", now=3)["techniques"] == ["T1", "T2"]
+    engine.observe("b", now=3)
+    engine.observe("c", now=4)
+    assert engine.state("a", now=5) is None
+    assert engine.state("c", now=5)["events"] == 1
+
+
+def test_observe_all_links_keys_and_merges_state():
+    engine = CorrelationEngine()
+    engine.observe_all(["session-a", "asset:domain_controller"], techniques=["T1059"],
+                       phases=["execution_phase"], now=0)
+    state = engine.observe_all(["session-b", "asset:domain_controller"], techniques=["T1003"],
+                               phases=["credential_access_phase"], now=120)
+    assert state["key"] == "session-b"
+    assert state["linked"] == ["asset:domain_controller"]
+    assert state["events"] == 2
+    assert state["phase"] == "credential_access_phase"
+    assert state["techniques"] == ["T1003", "T1059"]
+    assert state["first_seen"] == 0 and state["last_seen"] == 120
+    assert engine.observe_all([]) is None
@@ -0,0 +1,36 @@
+import pytest
+from hyperon import MeTTa
+
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+from metta.metrics import metrics
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["space", "index"])
+def rag(request):
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    return IncidentRAG(metta, use_index=request.param)
+
+
+def test_resolve_indicators_follows_the_chain(rag):
+    entry = rag.resolve_indicators(["powershell", "not_in_graph"])
+    assert entry["powershell"]["techniques"] == ["T1059.001"]
+    assert entry["not_in_graph"]["techniques"] == []
+
+
+def test_lookups_are_timed_under_their_own_stage(rag):
+    metrics.reset()
+    rag.get_asset_severity("domain_controller")
+    rag.query_faq("What is lateral movement?")
+    stages = metrics.summary()
+    assert stages["metta.asset_severity"]["count"] == 1
+    assert stages["metta.faq"]["count"] == 1
+
+
+def test_lookups_return_every_value(rag):
+    rag.add_knowledge("response", "persistence", "Audit new services")
+    assert rag.get_response_actions("persistence") == [
+        "Remove scheduled tasks, check startup items, scan for backdoors",
+        "Audit new services",
+    ]
@@ -0,0 +1,107 @@
+import asyncio
+
+from metta.cache import CompletionCache
+from metta.utils import AsyncLLM, _acomplete_all
+
+from stub_llm import StubLLMServer
+
+
+def make_llm(server, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return AsyncLLM(api_key="test", base_url=server.base_url, **kwargs)
+
+
+def run(coro_fn, server, **kwargs):
+    async def main():
+        llm = make_llm(server, **kwargs)
+        try:
+            return await coro_fn(llm)
+        finally:
+            await llm.close()
+
+    return asyncio.run(main())
+
+
+def test_completion():
+    with StubLLMServer(reply="isolate the host") as server:
+        assert run(lambda llm: llm.create_completion("p"), server) == "isolate the host"
+        assert server.requests == 1
+
+
+def test_retries_transient_errors():
+    with StubLLMServer(reply="ok", fail_first=2) as server:
+        assert run(lambda llm: llm.create_completion("p"), server, max_retries=3) == "ok"
+        assert server.requests == 3
+
+
+def test_gives_up_after_max_retries():
+    with StubLLMServer(fail_first=10) as server:
+        try:
+            run(lambda llm: llm.create_completion("p"), server, max_retries=1)
+        except Exception as e:
+            assert "503" in str(e) or "unavailable" in str(e)
+        else:
+            raise AssertionError("expected the 503 to be raised")
+        assert server.requests == 2
+
+
+def test_concurrent_identical_requests_share_one_call():
+    async def burst(llm):
+        return await asyncio.gather(*(llm.create_completion("same", key=("k",)) for _ in range(5)))
+
+    with StubLLMServer(reply="shared", delay=0.1) as server:
+        assert run(burst, server) == ["shared"] * 5
+        assert server.requests == 1
+
+
+def test_cache_hit_skips_the_server():
+    async def twice(llm):
+        return [await llm.create_completion("p"), await llm.create_completion("p")]
+
+    with StubLLMServer(reply="cached") as server:
+        assert run(twice, server, cache=CompletionCache()) == ["cached", "cached"]
+        assert server.requests == 1
+
+
+def test_stream_completion():
+    async def collect(llm):
+        return [delta async for delta in llm.stream_completion("p")]
+
+    with StubLLMServer(reply="contain then eradicate") as server:
+        assert run(collect, server) == ["contain", "then", "eradicate"]
+
+
+def test_slow_stream_consumer_does_not_hold_a_slot():
+    async def scenario(llm):
+        stream = llm.stream_completion("streamed")
+        first = await stream.__anext__()
+        # With one slot, this only completes if the stream released it
+        answer = await asyncio.wait_for(llm.create_completion("other"), 5)
+        return first, answer, [delta async for delta in stream]
+
+    with StubLLMServer(reply="a b c") as server:
+        assert run(scenario, server, max_in_flight=1) == ("a", "a b c", ["b", "c"])
+
+
+def test_stream_retries_before_first_delta():
+    async def collect(llm):
+        return [delta async for delta in llm.stream_completion("p")]
+
+    with StubLLMServer(reply="x y", fail_first=1) as server:
+        assert run(collect, server) == ["x", "y"]
+        assert server.requests == 2
+
+
+def test_only_final_answers_use_similar_cache_entries():
+    knowledge = "Query: '{}'\nSuggest MITRE ATT&CK techniques for these indicators."
+    final = "q: {}\nGive clear, actionable incident response guidance."
+
+    async def scenario(llm):
+        for indicator in ("dns_tunneling", "dns_beaconing"):
+            await _acomplete_all([(knowledge.format(indicator), 300, None, "llm.knowledge")], llm)
+        for query in ("how do we contain this incident", "how do we contain this incident?"):
+            await _acomplete_all([(final.format(query), 250, None, "llm.final")], llm)
+
+    with StubLLMServer() as server:
+        run(scenario, server, cache=CompletionCache(similarity=0.8))
+        assert server.requests == 3
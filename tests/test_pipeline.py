@@ -0,0 +1,36 @@
+from hyperon import MeTTa
+
+from metta.classifier import LocalClassifier
+from metta.correlation import CorrelationEngine
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+from metta.utils import _context_steps, _run_steps, correlation_keys, format_findings
+
+
+def findings_for(query, rag, classifier, correlator, session, sender):
+    # Known indicators are classified locally, so no completion is requested
+    return _run_steps(_context_steps(query, rag, classifier, correlator, session, sender), llm=None)
+
+
+def test_correlation_keys():
+    assert correlation_keys("s", "agent1", ["domain_controller"]) == ["s", "sender:agent1", "asset:domain_controller"]
+    assert correlation_keys() == []
+
+
+def test_reports_on_the_same_asset_are_linked_across_sessions():
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    rag = IncidentRAG(metta, use_index=True)
+    classifier = LocalClassifier(rag)
+    correlator = CorrelationEngine()
+
+    first = findings_for("powershell on DC01", rag, classifier, correlator, "session-a", "host-1")
+    assert first["campaign"]["events"] == 1
+    second = findings_for("lsass access on DC01", rag, classifier, correlator, "session-b", "host-2")
+    assert second["campaign"]["events"] == 2
+    assert second["campaign"]["linked"] == ["asset:domain_controller"]
+    assert second["campaign"]["phase"] == "credential_access_phase"
+    assert "Linked By: asset:domain_controller" in format_findings(second)
+
+    third = findings_for("smb admin share traffic", rag, classifier, correlator, "session-c", "host-2")
+    assert third["campaign"]["linked"] == ["sender:host-2"]
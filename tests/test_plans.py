@@ -0,0 +1,78 @@
+import pytest
+from hyperon import MeTTa
+
+from metta.incidentrag import IncidentRAG
+from metta.knowledge import initialize_knowledge_graph
+
+
+@pytest.fixture(params=[False, True], ids=["space", "index"])
+def rag(request):
+    metta = MeTTa()
+    initialize_knowledge_graph(metta)
+    rag = IncidentRAG(metta, use_index=request.param, materialize=True)
+    refreshed = []
+    resolve = rag.resolve_indicators
+
+    def recording_resolve(indicators):
+        refreshed.append(sorted(indicators))
+        return resolve(indicators)
+
+    rag.resolve_indicators = recording_resolve
+    rag.refreshed = refreshed
+    return rag
+
+
+def untouched(rag, before, changed):
+    """True if every plan entry except ``changed`` is the very object it was before."""
+    return all(rag.plans.entries[i] is entry for i, entry in before.items() if i not in changed)
+
+
+def test_new_indicator_adds_only_its_entry(rag):
+    before = dict(rag.plans.entries)
+    rag.add_knowledge("indicator", "dns_tunneling", "T1059.001")
+    assert rag.refreshed == [["dns_tunneling"]]
+    assert rag.plans.plan(["dns_tunneling"])["techniques"] == ["T1059.001"]
+    assert untouched(rag, before, ())
+
+
+def test_severity_refreshes_indicators_of_that_technique(rag):
+    before = dict(rag.plans.entries)
+    rag.add_knowledge("severity", "T1059.001", "critical")
+    assert rag.refreshed == [["powershell"]]
+    assert rag.plans.plan(["powershell"])["severity"] == "critical"
+    assert untouched(rag, before, {"powershell"})
+
+
+def test_technique_refreshes_indicators_of_that_technique(rag):
+    before = dict(rag.plans.entries)
+    rag.add_knowledge("technique", "T1486", "TA0010")
+    assert rag.refreshed == [["file_encryption"]]
+    assert "TA0010" in rag.plans.entries["file_encryption"]["tactics"]
+    assert untouched(rag, before, {"file_encryption"})
+
+
+def test_tactic_refreshes_indicators_of_that_tactic(rag):
+    before = dict(rag.plans.entries)
+    rag.add_knowledge("tactic", "TA0008", "pivot_phase")
+    assert rag.refreshed == [["rdp_connection", "smb_traffic"]]
+    assert "pivot_phase" in rag.plans.plan(["smb_traffic"])["phases"]
+    assert untouched(rag, before, {"rdp_connection", "smb_traffic"})
+
+
+def test_response_drops_only_that_cached_pattern(rag):
+    rag.plans.plan(["powershell"])
+    rag.plans.plan(["smb_traffic"])
+    assert {"execution", "lateral_movement"} <= set(rag.plans.responses)
+    rag.add_knowledge("response", "execution", "Kill the process tree")
+    assert "execution" not in rag.plans.responses
+    assert "lateral_movement" in rag.plans.responses
+    assert "Kill the process tree" in rag.plans.plan(["powershell"])["response_actions"]
+    assert rag.refreshed == []
+
+
+def test_asset_severity_updates_only_that_asset(rag):
+    before = dict(rag.plans.asset_severity)
+    rag.add_knowledge("asset_severity", "workstation", "high")
+    assert rag.plans.asset_severity == dict(before, workstation="high")
+    assert rag.plans.plan(["powershell"], ["workstation"])["severity"] == "high"
+    assert rag.refreshed == []
@@ -0,0 +1,76 @@
+from metta.prompts import build_context, count_tokens, final_prompt, max_tokens_for, parse_answer
+
+
+def test_parse_json_answer():
+    parsed = parse_answer('{"question": "What now?", "answer": "Isolate the host."}', "q")
+    assert parsed == {"selected_question": "What now?", "humanized_answer": "Isolate the host."}
+
+
+def test_parse_fenced_json_with_surrounding_text():
+    response = 'Here you go:\n```json\n{"answer": "Reset credentials."}\n```'
+    assert parse_answer(response, "q") == {"selected_question": "q", "humanized_answer": "Reset credentials."}
+
+
+def test_parse_truncated_json_keeps_partial_answer():
+    parsed = parse_answer('{"question": "x", "answer": "Block SMB at the \\"edge\\" and', "q")
+    assert parsed == {"selected_question": "q", "humanized_answer": 'Block SMB at the "edge" and'}
+
+
+def test_parse_legacy_layout():
+    parsed = parse_answer("Selected Question: How to respond?\nHumanized Answer: Contain first.", "q")
+    assert parsed == {"selected_question": "How to respond?", "humanized_answer": "Contain first."}
+
+
+def test_parse_plain_text_falls_back_to_whole_completion():
+    assert parse_answer("Just contain it.", "q") == {"selected_question": "q", "humanized_answer": "Just contain it."}
+    assert parse_answer(None, "q") == {"selected_question": "q", "humanized_answer": ""}
+
+
+FINDINGS = {
+    "intent": "indicator",
+    "indicators": ["powershell", "lsass_access"],
+    "techniques": ["T1059.001", "T1003.001"],
+    "phases": ["execution_phase", "credential_access_phase"],
+    "severity": "critical",
+    "assets": ["domain_controller"],
+    "response_actions": ["Isolate the host", "Reset credentials"],
+}
+
+
+def test_build_context_within_budget_keeps_everything():
+    context = build_context("powershell on DC01", FINDINGS)
+    assert context.splitlines() == [
+        "q: powershell on DC01",
+        "indicators: powershell,lsass_access",
+        "techniques: T1059.001,T1003.001",
+        "phases: execution,credential_access",
+        "severity: critical",
+        "assets: domain_controller",
+        "actions: Isolate the host; Reset credentials",
+    ]
+
+
+def test_build_context_respects_budget():
+    findings = dict(FINDINGS, techniques=[f"T{i:04d}" for i in range(200)])
+    context = build_context("powershell on DC01", findings, budget=60)
+    assert count_tokens(context) <= 60
+    assert "severity: critical" in context
+    assert "+195 more" in context
+
+
+def test_final_prompt_and_max_tokens_follow_intent():
+    assert max_tokens_for(FINDINGS) == 350
+    assert max_tokens_for({"intent": "faq"}) == 200
+    assert "Reply with JSON only" in final_prompt("q", FINDINGS)
+    assert "Reply with JSON only" not in final_prompt("q", FINDINGS, json_output=False)
+
+
+def test_build_context_truncates_a_long_query_before_dropping_findings():
+    query = "Alert: " + "process tree with encoded powershell arguments " * 30
+    assert len(query) > 1400
+    context = build_context(query, FINDINGS, budget=300)
+    assert count_tokens(context) <= 300
+    for line in ("indicators: powershell,lsass_access", "techniques: T1059.001,T1003.001",
+                 "severity: critical", "actions: Isolate the host; Reset credentials"):
+        assert line in context
+    assert context.splitlines()[0].endswith("…")
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from metta import workers
+from metta.index import match_space
+from metta.metrics import metrics
+from metta.workers import WorkerPool
+
+
+class FakeLLM:
+    async def create_completion(self, prompt, max_tokens=300, key=None, similar=False):
+        return '{"question": "q", "answer": "Isolate the host."}'
+
+    async def stream_completion(self, prompt, max_tokens=300, similar=False):
+        yield "Isolate the host."
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = WorkerPool(1, {"store_path": str(tmp_path / "learned.db")})
+    for future in pool.start():
+        future.result(timeout=60)
+    yield pool
+    pool.close()
+
+
+def test_worker_timings_reach_the_parent(pool):
+    metrics.reset()
+    result = asyncio.run(pool.aprocess_query("powershell and lsass access", FakeLLM()))
+    assert result["humanized_answer"] == "Isolate the host."
+    stages = metrics.summary()
+    assert stages["intent.local"]["count"] == 1
+    assert stages["metta.resolve_indicators"]["count"] == 1
+    assert stages["query"]["count"] == 1
+
+
+def test_dead_worker_is_replaced(pool):
+    pid = pool.start()[0].result(timeout=60)
+    os.kill(pid, signal.SIGKILL)
+
+    async def scenario():
+        with pytest.raises(BrokenProcessPool):
+            await pool.local_findings("powershell")
+        return await pool.local_findings("powershell")
+
+    assert asyncio.run(scenario())["indicators"] == ["powershell"]
+
+
+@pytest.mark.parametrize("use_index", [False, True], ids=["space", "index"])
+def test_sync_learned_skips_facts_the_worker_already_has(tmp_path, use_index):
+    workers._init_worker({"store_path": str(tmp_path / "learned.db"), "use_index": use_index})
+    rag, store = workers._worker["rag"], workers._worker["store"]
+    try:
+        facts = []
+        rag.subscribe(lambda *fact: facts.append(fact))
+        rag.add_knowledge("indicator", "dns_tunneling", "T1071.004")
+        deadline = time.monotonic() + 10
+        while not store.since(workers._worker["last_id"]) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        workers._sync_learned()
+        assert match_space(rag.metta, "indicator", "dns_tunneling") == ["T1071.004"]
+        assert len(facts) == 1
+    finally:
+        store.close()
+        workers._worker.clear()
+
+
+def test_correlation_spans_sessions_in_the_parent(pool):
+    async def findings(query, session, sender):
+        events = [event async for event in pool.astream_query(query, FakeLLM(), session=session, sender=sender)]
+        return dict(events)["findings"]
+
+    async def scenario():
+        await findings("powershell on DC01", "session-a", "host-1")
+        return await findings("lsass access on DC01", "session-b", "host-2")
+
+    assert "Linked By: asset:domain_controller" in asyncio.run(scenario())